@@ -10,8 +10,8 @@ from modules.scraper import ArxivScraper
 from modules.compiler import CompilationAgent
 from modules.database import db
 from modules.vector_db import vector_db
-from modules.knowledge_graph import knowledge_graph
-from modules.hybrid_rag import hybrid_rag_engine
+from modules.knowledge_graph import get_knowledge_graph
+from modules.hybrid_rag import get_hybrid_rag_engine
 from modules.survey_generator import survey_generator
 from modules.utils import logger, format_duration
 
@@ -453,7 +453,7 @@ def get_stats():
     
     # Add RAG statistics
     vector_stats = vector_db.get_statistics()
-    graph_stats = knowledge_graph.get_statistics()
+    graph_stats = get_knowledge_graph().get_statistics()
     
     stats['vector_db'] = vector_stats
     stats['knowledge_graph'] = graph_stats
@@ -469,7 +469,7 @@ def admin_panel():
 def view_knowledge_graph():
     """View the knowledge graph visualization."""
     try:
-        graph = knowledge_graph.graph
+        graph = get_knowledge_graph().graph
         
         if graph.number_of_nodes() == 0:
             return render_template('error.html', 
@@ -492,8 +492,7 @@ def view_knowledge_graph():
                 'citations': node_data.get('citation_count', 0) if node_type == 'paper' else 0
             })
         
-        for source, target, key in graph.edges(keys=True):
-            edge_data = graph.edges[source, target, key]
+        for source, target, edge_data in graph.edges(data=True):
             edges.append({
                 'source': source,
                 'target': target,
@@ -503,7 +502,7 @@ def view_knowledge_graph():
         return render_template('knowledge_graph.html', 
                              nodes=nodes, 
                              edges=edges,
-                             stats=knowledge_graph.get_statistics())
+                             stats=get_knowledge_graph().get_statistics())
         
     except Exception as e:
         logger.error(f"Error viewing knowledge graph: {e}", exc_info=True)
@@ -547,7 +546,7 @@ def rag_query():
         
         # Query Hybrid RAG engine
         # If job_id is provided, filter by it; otherwise search all papers
-        result = hybrid_rag_engine.query(question, job_id=job_id, specific_paper_id=None)
+        result = get_hybrid_rag_engine().query(question, job_id=job_id, specific_paper_id=None)
         
         logger.info(f"✅ Hybrid RAG query completed: {len(result.get('sources', []))} sources")
         
@@ -569,7 +568,7 @@ def get_research_summary():
         # For now, return basic summary from knowledge graph
         stats = {
             'summary': 'Research summary feature uses knowledge graph analysis',
-            'statistics': knowledge_graph.get_research_overview()
+            'statistics': get_knowledge_graph().get_research_overview()
         }
         return jsonify(stats)
     except Exception as e:
@@ -580,7 +579,7 @@ def get_research_summary():
 def get_related_papers(paper_id):
     """Get papers related to a specific paper."""
     try:
-        related = knowledge_graph.find_related_papers(paper_id, max_results=10)
+        related = get_knowledge_graph().find_related_papers(paper_id, max_results=10)
         return jsonify({'paper_id': paper_id, 'related_papers': related})
     except Exception as e:
         logger.error(f"Error finding related papers: {e}")
@@ -628,8 +627,8 @@ def get_index_status():
                 for j in recent_jobs
             ],
             'knowledge_graph': {
-                'nodes': knowledge_graph.graph.number_of_nodes(),
-                'edges': knowledge_graph.graph.number_of_edges()
+                'nodes': get_knowledge_graph().graph.number_of_nodes(),
+                'edges': get_knowledge_graph().graph.number_of_edges()
             }
         })
         
@@ -654,6 +653,7 @@ def reindex_all():
         indexed_count = 0
         total_chunks = 0
         errors = []
+        graph_items = []
         
         for paper in all_papers:
             if not paper.get('compiled_json_path') or not os.path.exists(paper['compiled_json_path']):
@@ -667,12 +667,8 @@ def reindex_all():
                 chunks = vector_db.index_paper(paper['id'], paper_data)
                 total_chunks += chunks
                 
-                # Add to knowledge graph
-                knowledge_graph.add_paper(paper['id'], paper_data)
-                
-                # Link citations
-                if paper_data.get('references'):
-                    knowledge_graph.link_citations(paper['id'], paper_data['references'])
+                # Queue for the knowledge graph batch below
+                graph_items.append((paper['id'], paper_data))
                 
                 indexed_count += 1
                 logger.info(f"✅ Indexed paper {paper['id']}: {chunks} chunks")
@@ -682,12 +678,18 @@ def reindex_all():
                 errors.append(error_msg)
                 logger.error(f"❌ {error_msg}")
         
+        # Add to knowledge graph in one batch, then link citations against all papers
+        get_knowledge_graph().add_papers(graph_items)
+        for paper_id, paper_data in graph_items:
+            if paper_data.get('references'):
+                get_knowledge_graph().link_citations(paper_id, paper_data['references'])
+        
         # Save knowledge graph
-        knowledge_graph.save_graph()
+        get_knowledge_graph().save_graph()
         
         # Get final stats
         vector_stats = vector_db.get_statistics()
-        graph_stats = knowledge_graph.get_statistics()
+        graph_stats = get_knowledge_graph().get_statistics()
         
         return jsonify({
             'success': True,
@@ -1151,12 +1153,12 @@ def process_papers_background(job_id: int, topic: str, num_papers: int):
                     
                     # Automatically add paper to knowledge graph
                     try:
-                        knowledge_graph.add_paper(paper_id, result)
+                        get_knowledge_graph().add_paper(paper_id, result, job_id=job_id)
                         logger.info(f"Added paper {paper_id} to knowledge graph")
                         
                         # Link citations if available
                         if result.get('references'):
-                            knowledge_graph.link_citations(paper_id, result['references'])
+                            get_knowledge_graph().link_citations(paper_id, result['references'])
                             logger.info(f"Linked citations for paper {paper_id}")
                     except Exception as e:
                         logger.error(f"Error adding paper to knowledge graph: {e}")
@@ -1187,7 +1189,7 @@ def process_papers_background(job_id: int, topic: str, num_papers: int):
         
         # Save knowledge graph to disk
         try:
-            knowledge_graph.save_graph()
+            get_knowledge_graph().save_graph()
             logger.info("Knowledge graph saved successfully")
         except Exception as e:
             logger.error(f"Error saving knowledge graph: {e}")
@@ -12,13 +12,30 @@ class Config:
     ARXIV_RATE_LIMIT_DELAY: float = 3.0
     PDF_DOWNLOAD_TIMEOUT: int = 60
     PDF_MAX_RETRIES: int = 3
+    PDF_DOWNLOAD_WORKERS: int = 4  # Concurrent PDF downloads per search
+    PDF_DOWNLOAD_CHUNK_SIZE: int = 1024 * 1024  # Bytes per write when saving PDFs
+    PDF_PREFLIGHT_HEAD: bool = False  # HEAD-check PDF links before downloading (some mirrors reject HEAD)
+    ARXIV_FEED_CACHE_TTL: int = 3600  # Seconds a cached arXiv search response is reused (0 disables)
+    ARXIV_FEED_CACHE_SIZE: int = 128  # Max cached arXiv search responses kept on disk
     
     SEMANTIC_SCHOLAR_API: str = "https://api.semanticscholar.org/graph/v1"
     ENABLE_CITATION_FETCH: bool = True
+    SEMANTIC_SCHOLAR_RATE_LIMIT: float = 1.0  # Requests per second (unauthenticated limit; 0 disables)
+    CITATION_CACHE_TTL: int = 7 * 86400  # Seconds cached citation counts are reused (0 disables)
+    CITATION_CACHE_SIZE: int = 4096  # Max cached citation counts kept on disk
     
     # ========== COMPILER SETTINGS ==========
     OLLAMA_MODEL: str = "llama3.2:latest"
     OLLAMA_TIMEOUT: int = 120
+    OLLAMA_HOST: str = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+    OLLAMA_WARMUP: bool = True  # Load the model in the background at startup
+    OLLAMA_KEEP_ALIVE: str = "30m"  # How long ollama keeps the model loaded after a request
+    LLM_MAX_CONNECTIONS: int = 16  # Pooled keep-alive connections to the LLM server, shared by all threads
+    
+    # Speculative decoding: set to the draft model a llama.cpp server was started
+    # with (llama-server --model-draft) to generate RAG answers there instead of ollama
+    RAG_DRAFT_MODEL: str = ""
+    LLAMACPP_HOST: str = os.environ.get("LLAMACPP_HOST", "http://localhost:8080")
     
     PAGE_LIMIT: int = 30
     WORD_LIMIT: int = 20000
@@ -47,6 +64,8 @@ class Config:
     # Vector Database
     CHROMA_PERSIST_DIR: str = "processed/chroma_db"
     CHROMA_COLLECTION_NAME: str = "research_papers"
+    VECTOR_QUANTIZED_SEARCH: bool = True  # Unfiltered searches use an int8 usearch index when installed
+    VECTOR_RERANK_FACTOR: int = 4  # Quantized candidates per result, re-ranked with full-precision vectors
     
     # Chunking Strategy (OPTIMIZED for research papers)
     CHUNK_SIZE: int = 600  # Increased from 512 for better context
@@ -61,6 +80,7 @@ class Config:
     # Answer Generation
     RAG_MAX_CONTEXT_LENGTH: int = 4000  # Increased from 3000
     RAG_TEMPERATURE: float = 0.2
+    RAG_BATCH_WORKERS: int = 4  # Questions answered concurrently by query_batch
     
     # Query Expansion
     RAG_ENABLE_QUERY_EXPANSION: bool = True  # NEW
@@ -68,11 +88,23 @@ class Config:
     
     # Re-ranking
     RAG_ENABLE_RERANKING: bool = True  # NEW
+    CROSS_ENCODER_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    CROSS_ENCODER_MIN_CANDIDATES: int = 6  # Skip reranking below this many results
+    RAG_MIN_RERANK_SCORE: float = -6.0  # Skip LLM generation when the best cross-encoder logit is below this
     BOOST_CONTRIBUTIONS: float = 1.5  # NEW
     BOOST_ABSTRACTS: float = 1.3  # NEW
     
+    # BM25 Index
+    BM25_CACHE_PATH: str = "processed/cache/bm25_index.pkl"
+    
+    # Query Result Cache
+    RAG_QUERY_CACHE_SIZE: int = 256  # Max cached answers kept on disk (LRU)
+    RAG_QUERY_MEMORY_CACHE_SIZE: int = 64  # Cached answers also kept in memory (LRU)
+    RAG_ANSWER_CACHE_SIZE: int = 256  # Max LLM responses kept in memory per prompt (LRU)
+    
     # ========== KNOWLEDGE GRAPH SETTINGS ==========
     GRAPH_DB_PATH: str = "processed/knowledge_graph.pkl"  # Changed to .pkl
+    GRAPH_CHECKPOINT_INTERVAL: int = 5000  # WAL records before the graph snapshot is rewritten
     ENABLE_GRAPH_VISUALIZATION: bool = True
     GRAPH_EXPORT_DIR: str = "processed/graph_exports"
     
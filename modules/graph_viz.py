@@ -5,6 +5,7 @@ import networkx as nx
 from typing import Dict, List, Optional
 from config import config
 from modules.utils import logger
+from modules.knowledge_graph import relationship_name
 
 try:
     import matplotlib
@@ -18,7 +19,7 @@ except:
 class GraphVisualizer:
     """Generate visualizations of the knowledge graph."""
     
-    def __init__(self, graph: nx.MultiDiGraph):
+    def __init__(self, graph: nx.DiGraph):
         self.graph = graph
         self.export_dir = config.GRAPH_EXPORT_DIR
         os.makedirs(self.export_dir, exist_ok=True)
@@ -84,8 +85,8 @@ class GraphVisualizer:
                 })
             
             # Process edges
-            for source, target, key, edge_data in subgraph.edges(keys=True, data=True):
-                relationship = edge_data.get('relationship', 'related')
+            for source, target, edge_data in subgraph.edges(data=True):
+                relationship = relationship_name(edge_data)
                 
                 # Edge style by relationship
                 if relationship == 'cites':
@@ -129,7 +130,7 @@ class GraphVisualizer:
             logger.error(f"HTML export error: {e}", exc_info=True)
             return None
     
-    def _filter_by_job(self, job_id: int) -> nx.MultiDiGraph:
+    def _filter_by_job(self, job_id: int) -> nx.DiGraph:
         """Filter graph to papers from specific job."""
         from modules.database import db
         
@@ -368,8 +369,9 @@ Year: {node_data.get('year', 'N/A')}
                 data['nodes'].append(node_data)
             
             # Edges
-            for source, target, key, edge_data in self.graph.edges(keys=True, data=True):
+            for source, target, edge_data in self.graph.edges(data=True):
                 edge = dict(edge_data)
+                edge['relationship'] = relationship_name(edge_data)
                 edge['source'] = source
                 edge['target'] = target
                 data['edges'].append(edge)
@@ -385,7 +387,7 @@ Year: {node_data.get('year', 'N/A')}
             logger.error(f"JSON export error: {e}")
             return None
 
-def visualize_graph(graph: nx.MultiDiGraph, job_id: Optional[int] = None) -> str:
+def visualize_graph(graph: nx.DiGraph, job_id: Optional[int] = None) -> str:
     """
     Convenience function to visualize graph.
     
@@ -1,15 +1,85 @@
 # modules/hybrid_rag.py - Hybrid RAG with BM25 + Semantic Search
+import os
 import json
 import re
 import math
-from typing import List, Dict, Optional, Set, Tuple
-from collections import defaultdict, Counter
-import ollama
+import pickle
+import asyncio
+import hashlib
+import functools
+import itertools
+import threading
+from typing import List, Dict, Optional, Set, Tuple, Iterator, AsyncIterator
+from collections import defaultdict, Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import numpy as np
+from sentence_transformers import CrossEncoder
 from config import config
-from modules.utils import logger
+from modules.utils import logger, get_cache_path, cache_exists, prune_cache
 from modules.vector_db import vector_db
-from modules.knowledge_graph import knowledge_graph
+from modules.knowledge_graph import get_knowledge_graph
 from modules.database import db
+from modules.llm_backend import get_llm_client
+
+# numba is optional: when installed, the BM25 accumulation loop is JIT-compiled
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+if njit is not None:
+    @njit(cache=True, fastmath=True, boundscheck=False)
+    def _bm25_accumulate(scores, positions, tf, doc_lengths, idf, k1, b, avg_doc_length):
+        """Add one term's BM25 contribution to scores for every document in its posting list."""
+        for i in range(positions.shape[0]):
+            position = positions[i]
+            t = tf[i]
+            denominator = t + k1 * (1 - b + b * doc_lengths[position] / avg_doc_length)
+            scores[position] += idf * t * (k1 + 1) / denominator
+else:
+    _bm25_accumulate = None
+
+# Average characters per word (including the separating space), used to turn
+# the word budget for the context into a character budget
+_CHARS_PER_WORD = 6
+
+# Answer prompt template, filled with str.format_map (values are not re-parsed)
+_ANSWER_PROMPT = """You are a research expert analyzing scientific papers. Answer the following question based ONLY on the provided research context.
+
+CONTEXT FROM RESEARCH PAPERS:
+{context}{kg_section}
+
+QUESTION: {question}
+
+INSTRUCTIONS:
+1. Answer comprehensively using information from the papers
+2. Cite specific papers: [Paper Title - ArXiv ID]
+3. If papers provide different perspectives, mention all
+4. Use knowledge graph connections to show how papers relate to each other
+5. Be specific about methods, results, and findings
+6. If information is insufficient, clearly state it
+7. When multiple papers address the same topic, discuss their relationships and differences
+
+ANSWER:"""
+
+_KG_SECTION_HEADER = "\n\nKNOWLEDGE GRAPH CONNECTIONS:\n"
+
+@dataclass(frozen=True)
+class _BM25Index:
+    """One consistent BM25 index; a refresh swaps in a new instance, never edits this one."""
+    fingerprint: Optional[str]
+    n_docs: int  # Number of indexed sections
+    document_metadata: Dict
+    doc_ids: List[int]  # position -> paper_sections.id
+    inverted_index: Dict[str, np.ndarray]  # word -> int32 array of doc positions
+    term_freqs: Dict[str, np.ndarray]  # word -> float32 array of counts, parallel to inverted_index
+    doc_lengths: np.ndarray  # position -> token count
+    avg_doc_length: float
+    
+    @classmethod
+    def empty(cls, fingerprint: Optional[str] = None) -> '_BM25Index':
+        return cls(fingerprint, 0, {}, [], {}, {}, np.zeros(0, dtype=np.float32), 0)
 
 class BM25Retriever:
     """
@@ -17,24 +87,145 @@ class BM25Retriever:
     Excellent for finding papers with specific technical terms and keywords.
     """
     
+    # Alphanumeric/underscore words of 3+ chars; compiled once for indexing and queries
+    token_pattern = re.compile(r'\b[a-z0-9_]{3,}\b')
+    
     def __init__(self):
-        self.documents = []  # Store documents for indexing
-        self.document_metadata = {}
-        self.inverted_index = defaultdict(list)  # word -> [doc_ids]
-        self.doc_lengths = {}
-        self.avg_doc_length = 0
-        self.word_freqs = defaultdict(lambda: defaultdict(int))  # doc_id -> {word: count}
-        
         # BM25 parameters
         self.k1 = 1.5  # Term saturation parameter
         self.b = 0.75   # Length normalization parameter
         
-        self._load_index()
+        # Per-thread score buffers, reused across searches (queries may run concurrently)
+        self.score_buffers = threading.local()
+        
+        self.cache_path = config.BM25_CACHE_PATH
+        fingerprint = self._compute_fingerprint()
+        
+        # Reuse the persisted index unless the indexed data changed since it was built
+        index = self._load_cached_index(fingerprint)
+        if index is None:
+            index = self._build_index(fingerprint) or _BM25Index.empty(fingerprint)
+            self._save_cached_index(index)
+        
+        # Searches read this reference once, so they always score against one whole index
+        self.index = index
         logger.info("BM25 Retriever initialized")
     
-    def _load_index(self):
-        """Load BM25 index from database."""
+    @property
+    def fingerprint(self) -> Optional[str]:
+        """Fingerprint of the indexed data the current index was built from."""
+        return self.index.fingerprint
+    
+    def _compute_fingerprint(self) -> Optional[str]:
+        """
+        Fingerprint the indexed data so a stale on-disk index can be detected.
+        
+        Covers paper_sections and the paper fields copied into each document's
+        metadata (title, arXiv ID, job), so editing or reassigning a paper
+        invalidates the cache too.
+        """
+        try:
+            with db.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT COUNT(*) as count, MAX(id) as max_id, SUM(LENGTH(content)) as total_length
+                    FROM paper_sections
+                ''')
+                row = cursor.fetchone()
+                digest = hashlib.sha256(f"{row['count']}:{row['max_id']}:{row['total_length']}".encode())
+                
+                # One short row per indexed paper, hashed exactly
+                cursor.execute('''
+                    SELECT id, job_id, title, arxiv_id FROM papers
+                    WHERE id IN (SELECT DISTINCT paper_id FROM paper_sections)
+                    ORDER BY id
+                ''')
+                cursor.arraysize = 1000
+                for paper in itertools.chain.from_iterable(iter(cursor.fetchmany, [])):
+                    digest.update(f"\0{paper['id']}\0{paper['job_id']}\0{paper['title']}\0{paper['arxiv_id']}".encode())
+                return digest.hexdigest()
+        except Exception as e:
+            logger.warning(f"Could not fingerprint paper_sections: {e}")
+            return None
+    
+    def _load_cached_index(self, fingerprint: Optional[str]) -> Optional[_BM25Index]:
+        """Load a previously built BM25 index from disk if it is still current."""
+        if not fingerprint or not os.path.exists(self.cache_path):
+            return None
+        
+        try:
+            with open(self.cache_path, 'rb') as f:
+                state = pickle.load(f)
+            
+            if state.get('fingerprint') != fingerprint:
+                logger.info("BM25 cache is stale, rebuilding index")
+                return None
+            
+            index = _BM25Index(
+                fingerprint, state['n_docs'], state['document_metadata'], state['doc_ids'],
+                state['inverted_index'], state['term_freqs'], state['doc_lengths'],
+                state['avg_doc_length']
+            )
+            
+            logger.info(f"BM25 index loaded from cache: {index.n_docs} documents, {len(index.inverted_index)} unique terms")
+            return index
+        
+        except Exception as e:
+            logger.warning(f"Could not load BM25 cache: {e}")
+            return None
+    
+    def _save_cached_index(self, index: _BM25Index):
+        """Persist the built BM25 index so the next start can skip tokenization."""
+        if not index.fingerprint:
+            return
+        
+        try:
+            state = {
+                'fingerprint': index.fingerprint,
+                'n_docs': index.n_docs,
+                'document_metadata': index.document_metadata,
+                'doc_ids': index.doc_ids,
+                'inverted_index': index.inverted_index,
+                'term_freqs': index.term_freqs,
+                'doc_lengths': index.doc_lengths,
+                'avg_doc_length': index.avg_doc_length
+            }
+            
+            # Write under a per-thread name, then swap in atomically, so a crash
+            # mid-write never leaves a truncated cache for the next start to load
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, 'wb') as f:
+                    pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self.cache_path)
+            except Exception:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+            logger.debug(f"Saved BM25 index to {self.cache_path}")
+        except Exception as e:
+            logger.warning(f"Could not save BM25 cache: {e}")
+    
+    def _build_index(self, fingerprint: Optional[str]) -> Optional[_BM25Index]:
+        """
+        Build a BM25 index from the database.
+        
+        Args:
+            fingerprint: Fingerprint of paper_sections taken before reading it
+        
+        Returns:
+            The new index, or None if it could not be built
+        """
         try:
+            postings = defaultdict(list)  # word -> [doc positions]
+            posting_tfs = defaultdict(list)  # word -> [counts]
+            doc_lengths = []
+            doc_ids = []
+            document_metadata = {}
+            
             with db.get_connection() as conn:
                 cursor = conn.cursor()
                 # Get all papers and sections with job_id for filtering
@@ -44,15 +235,18 @@ class BM25Retriever:
                     JOIN papers p ON ps.paper_id = p.id
                 ''')
                 
-                for row in cursor.fetchall():
+                # Stream rows in batches instead of materializing every section's content at once
+                cursor.arraysize = 1000
+                for row in itertools.chain.from_iterable(iter(cursor.fetchmany, [])):
                     doc_id = row['id']
                     paper_id = row['paper_id']
                     job_id = row['job_id']
                     content = row['content'] or ''
                     section_name = row['section_name']
                     
-                    self.documents.append(content)
-                    self.document_metadata[doc_id] = {
+                    position = len(doc_ids)
+                    doc_ids.append(doc_id)
+                    document_metadata[doc_id] = {
                         'paper_id': paper_id,
                         'job_id': job_id,  # Store job_id for filtering
                         'section': section_name,
@@ -62,44 +256,82 @@ class BM25Retriever:
                     
                     # Tokenize and index
                     tokens = self._tokenize(content)
-                    self.doc_lengths[doc_id] = len(tokens)
-                    
-                    for token in set(tokens):  # Unique tokens only for inverted index
-                        self.inverted_index[token].append(doc_id)
+                    doc_lengths.append(len(tokens))
                     
-                    for token in tokens:
-                        self.word_freqs[doc_id][token] += 1
-                
-                if self.documents:
-                    self.avg_doc_length = sum(self.doc_lengths.values()) / len(self.documents)
-                    logger.info(f"BM25 index loaded: {len(self.documents)} documents, {len(self.inverted_index)} unique terms")
+                    # Count once; the Counter's keys are the unique tokens for the inverted index
+                    for token, count in Counter(tokens).items():
+                        postings[token].append(position)
+                        posting_tfs[token].append(count)
+            
+            # Pack postings into contiguous arrays so search can score each term with numpy
+            inverted_index = {
+                token: np.asarray(positions, dtype=np.int32)
+                for token, positions in postings.items()
+            }
+            term_freqs = {
+                token: np.asarray(counts, dtype=np.float32)
+                for token, counts in posting_tfs.items()
+            }
+            doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+            avg_doc_length = float(doc_lengths.mean()) if doc_ids else 0
+            
+            index = _BM25Index(fingerprint, len(doc_ids), document_metadata, doc_ids,
+                               inverted_index, term_freqs, doc_lengths, avg_doc_length)
+            if index.n_docs:
+                logger.info(f"BM25 index loaded: {index.n_docs} documents, {len(index.inverted_index)} unique terms")
+            return index
         
         except Exception as e:
             logger.warning(f"Could not load BM25 index: {e}")
+            return None
 
     def refresh(self):
         """Rebuild BM25 index from the database to pick up newly processed papers."""
         try:
-            self.documents = []
-            self.document_metadata = {}
-            self.inverted_index = defaultdict(list)
-            self.doc_lengths = {}
-            self.word_freqs = defaultdict(lambda: defaultdict(int))
-            self.avg_doc_length = 0
-            self._load_index()
-            logger.info(f"BM25 index refreshed: {len(self.documents)} documents, {len(self.inverted_index)} unique terms")
+            index = self._build_index(self._compute_fingerprint())
+            if index is None:
+                return  # Keep serving the previous index
+            self._save_cached_index(index)
+            
+            # Publish with a single reference swap: concurrent searches finish on
+            # the index they started with, so positions, lengths and buffers agree
+            self.index = index
+            logger.info(f"BM25 index refreshed: {index.n_docs} documents, {len(index.inverted_index)} unique terms")
         except Exception as e:
             logger.warning(f"BM25 refresh failed: {e}")
     
+    def _doc_texts(self, doc_ids: List[int]) -> Dict[int, str]:
+        """Fetch section content for BM25 hits in a single query (the index keeps no text)."""
+        if not doc_ids:
+            return {}
+        
+        try:
+            with db.get_connection() as conn:
+                cursor = conn.cursor()
+                placeholders = ', '.join('?' * len(doc_ids))
+                cursor.execute(
+                    f'SELECT id, content FROM paper_sections WHERE id IN ({placeholders})',
+                    list(doc_ids)
+                )
+                return {row['id']: row['content'] or '' for row in cursor.fetchall()}
+        except Exception as e:
+            logger.warning(f"Could not fetch BM25 document text: {e}")
+            return {}
+    
     def _tokenize(self, text: str) -> List[str]:
         """Tokenize text for BM25."""
-        # Lowercase and remove special characters
-        text = text.lower()
-        # Keep alphanumeric and underscores
-        tokens = re.findall(r'\b[a-z0-9_]+\b', text)
-        # Remove very short tokens
-        tokens = [t for t in tokens if len(t) > 2]
-        return tokens
+        # Lowercase, keep alphanumeric/underscore words, drop very short tokens
+        return self.token_pattern.findall(text.lower())
+    
+    def _get_score_buffer(self, n_docs: int) -> np.ndarray:
+        """Return this thread's zeroed score buffer, reallocating only when the index size changed."""
+        scores = getattr(self.score_buffers, 'scores', None)
+        if scores is None or scores.shape[0] != n_docs:
+            scores = np.zeros(n_docs, dtype=np.float32)
+            self.score_buffers.scores = scores
+        else:
+            scores.fill(0)
+        return scores
     
     def search(self, query: str, top_k: int = 20, job_id: Optional[int] = None) -> List[Dict]:
         """
@@ -113,42 +345,58 @@ class BM25Retriever:
         Returns:
             List of search results with BM25 scores
         """
-        if not self.documents:
+        index = self.index  # One snapshot for the whole search; refresh may swap it meanwhile
+        if not index.n_docs:
             return []
         
         query_tokens = self._tokenize(query)
         if not query_tokens:
             return []
         
-        scores = {}
+        scores = self._get_score_buffer(index.n_docs)
         
         for token in query_tokens:
-            if token not in self.inverted_index:
+            positions = index.inverted_index.get(token)
+            if positions is None:
                 continue
             
             idf = math.log(
-                (len(self.documents) - len(self.inverted_index[token]) + 0.5) /
-                (len(self.inverted_index[token]) + 0.5) + 1
+                (index.n_docs - len(positions) + 0.5) /
+                (len(positions) + 0.5) + 1
             )
             
-            for doc_id in self.inverted_index[token]:
-                tf = self.word_freqs[doc_id][token]
-                doc_length = self.doc_lengths[doc_id]
-                
-                # BM25 formula
-                numerator = idf * tf * (self.k1 + 1)
-                denominator = tf + self.k1 * (1 - self.b + self.b * (doc_length / self.avg_doc_length))
-                score = numerator / denominator
-                
-                scores[doc_id] = scores.get(doc_id, 0) + score
+            tf = index.term_freqs[token]
+            
+            if _bm25_accumulate is not None:
+                _bm25_accumulate(scores, positions, tf, index.doc_lengths,
+                                 idf, self.k1, self.b, index.avg_doc_length)
+                continue
+            
+            doc_length = index.doc_lengths[positions]
+            
+            # BM25 formula, evaluated for every posting of this term at once
+            numerator = idf * tf * (self.k1 + 1)
+            denominator = tf + self.k1 * (1 - self.b + self.b * (doc_length / index.avg_doc_length))
+            
+            # Positions are unique within a posting list, so fancy-index += is safe here
+            scores[positions] += numerator / denominator
         
-        # Sort by score
-        sorted_results = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        # Sort matched documents by score
+        matched = np.flatnonzero(scores)
+        if job_id is None and matched.size > top_k:
+            # No filtering will drop results, so only the top_k candidates need sorting
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        sorted_positions = matched[np.argsort(-scores[matched], kind='stable')]
+        
+        # Normalizer is loop-invariant; compute it once
+        max_score = float(scores.max()) + 1e-10
         
         # Filter by job_id and return top_k
         results = []
-        for doc_id, score in sorted_results:
-            metadata = self.document_metadata.get(doc_id, {})
+        for position in sorted_positions:
+            doc_id = index.doc_ids[position]
+            score = float(scores[position])
+            metadata = index.document_metadata.get(doc_id, {})
             
             # Apply job_id filter for isolation (if job_id provided and metadata has real job_id)
             if job_id is not None:
@@ -163,7 +411,7 @@ class BM25Retriever:
                 'doc_id': doc_id,
                 'metadata': metadata,
                 'bm25_score': score,
-                'relevance_score': min(score / (max(scores.values()) + 1e-10), 1.0)  # Normalize
+                'relevance_score': min(score / max_score, 1.0)  # Normalize
             })
             
             if len(results) >= top_k:
@@ -184,6 +432,21 @@ class HybridRAGEngine:
     def __init__(self):
         self.model = config.OLLAMA_MODEL
         self.bm25 = BM25Retriever()
+        self.cross_encoder = None  # Loaded lazily on first rerank
+        
+        # Recently served answers, kept as JSON in front of the on-disk query cache
+        self._answer_cache: OrderedDict = OrderedDict()
+        self._answer_cache_lock = threading.Lock()
+        
+        # Shared pooled client: connections to the LLM server are reused across queries and engines
+        self._llm = get_llm_client()
+        
+        # BM25 (SQLite/numpy) and semantic (vector DB) retrieval are independent; run them side by side
+        self.retrieval_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='hybrid_rag')
+        
+        # Runs the blocking pipeline for async callers, bounding how many queries they run at once
+        self.async_pool = ThreadPoolExecutor(max_workers=config.RAG_BATCH_WORKERS,
+                                             thread_name_prefix='hybrid_rag_async')
         
         # Query preprocessing patterns
         self.keywords_pattern = r'\b(method|approach|model|algorithm|technique|framework|system|network|dataset|metric)\b'
@@ -192,7 +455,8 @@ class HybridRAGEngine:
         logger.info("Hybrid RAG Engine initialized with BM25 + Semantic Search")
     
     def query(self, question: str, job_id: Optional[int] = None, 
-             specific_paper_id: Optional[int] = None) -> Dict:
+             specific_paper_id: Optional[int] = None,
+             semantic_results: Optional[List[Dict]] = None) -> Dict:
         """
         Hybrid RAG query with BM25 + Semantic + Reranking.
         
@@ -200,24 +464,57 @@ class HybridRAGEngine:
             question: User's question
             job_id: Optional job filter
             specific_paper_id: Optional paper filter
+            semantic_results: Semantic hits already retrieved for this question
+                (used by query_batch); searched here when None
         
         Returns:
             Comprehensive answer with sources
         """
+        for event in self.query_stream(question, job_id, specific_paper_id, semantic_results):
+            if event['type'] == 'result':
+                return event['data']
+    
+    def query_stream(self, question: str, job_id: Optional[int] = None,
+                     specific_paper_id: Optional[int] = None,
+                     semantic_results: Optional[List[Dict]] = None) -> Iterator[Dict]:
+        """
+        Hybrid RAG query with BM25 + Semantic + Reranking, streaming the answer.
+        
+        Args:
+            question: User's question
+            job_id: Optional job filter
+            specific_paper_id: Optional paper filter
+            semantic_results: Semantic hits already retrieved for this question
+                (used by query_batch); searched here when None
+        
+        Yields:
+            {'type': 'token', 'content': str} events as the answer is generated,
+            then a final {'type': 'result', 'data': Dict} event with the same
+            data query() returns
+        """
         try:
             logger.info(f"🔍 Hybrid RAG Query: {question}")
             
+            # Serve repeated questions from the on-disk answer cache
+            cache_key = self._query_cache_key(question, job_id, specific_paper_id)
+            if config.ENABLE_CACHING:
+                cached_answer = self._load_cached_answer(cache_key)
+                if cached_answer is not None:
+                    logger.info("📦 Using cached Hybrid RAG answer")
+                    yield {'type': 'result', 'data': cached_answer}
+                    return
+            
             # Step 1: Query preprocessing
             processed_query = self._preprocess_query(question)
             logger.debug(f"Processed query: {processed_query}")
             
             # Step 2: Multi-stage retrieval with job_id isolation
-            logger.info("Retrieving BM25 results...")
-            bm25_results = self._retrieve_bm25(processed_query, top_k=20, job_id=job_id)
+            logger.info("Retrieving BM25 and semantic results...")
+            bm25_results, semantic_results = self._retrieve_parallel(
+                processed_query, question, job_id=job_id, paper_id=specific_paper_id,
+                semantic_results=semantic_results
+            )
             logger.info(f"BM25 retrieved: {len(bm25_results)} results")
-            
-            logger.info("Retrieving semantic results...")
-            semantic_results = self._retrieve_semantic(question, top_k=20, job_id=job_id, paper_id=specific_paper_id)
             logger.info(f"Semantic retrieved: {len(semantic_results)} results")
             
             # If no results from either method, refresh indexes and retry once
@@ -231,14 +528,18 @@ class HybridRAGEngine:
                     self.bm25.refresh()
                 except Exception as e:
                     logger.debug(f"BM25 refresh failed: {e}")
+                
+                # The refresh may have changed either index, and with it the key
+                cache_key = self._query_cache_key(question, job_id, specific_paper_id)
 
-                bm25_results = self._retrieve_bm25(processed_query, top_k=20, job_id=job_id)
-                semantic_results = self._retrieve_semantic(question, top_k=20, job_id=job_id, paper_id=specific_paper_id)
+                bm25_results, semantic_results = self._retrieve_parallel(
+                    processed_query, question, job_id=job_id, paper_id=specific_paper_id
+                )
                 logger.info(f"Post-refresh retrieval -> BM25: {len(bm25_results)}, Semantic: {len(semantic_results)}")
 
                 if not bm25_results and not semantic_results:
                     logger.warning(f"No results found for query after refresh: {question}")
-                    return {
+                    yield {'type': 'result', 'data': {
                         'answer': 'No relevant information found in the research papers. Try a different question or rephrase your query.',
                         'sources': [],
                         'confidence': 'low',
@@ -249,33 +550,54 @@ class HybridRAGEngine:
                             'after_fusion': 0,
                             'after_dedup': 0
                         }
-                    }
+                    }}
+                    return
             
             # Step 3: Reciprocal Rank Fusion (RRF)
             logger.info("Performing RRF fusion...")
             fused_results = self._reciprocal_rank_fusion(bm25_results, semantic_results)
             logger.info(f"After fusion: {len(fused_results)} unique results")
             
-            # Step 4: Reranking with cross-encoder (with timeout protection)
+            # Step 4: Reranking with cross-encoder (falls back to RRF order on failure)
             logger.info("Reranking with cross-encoder...")
             reranked = self._rerank_with_cross_encoder(question, fused_results)
             logger.info(f"After reranking: {len(reranked)} results")
             
             # Step 5: Deduplication
             logger.info("Deduplicating results...")
-            unique_results = self._deduplicate_results(reranked)
-            final_results = unique_results[:config.RAG_TOP_K_RESULTS]
+            unique_results = self._deduplicate_results(reranked, limit=config.RAG_TOP_K_RESULTS)
+            final_results = unique_results
             
             logger.info(f"Final results: {len(final_results)} unique documents")
             
             if not final_results:
                 logger.warning("No results after deduplication")
-                return {
+                yield {'type': 'result', 'data': {
                     'answer': 'No relevant information found. Try rephrasing your question.',
                     'sources': [],
                     'confidence': 'low',
                     'method': 'hybrid_rag'
-                }
+                }}
+                return
+            
+            # Skip generation when the reranker judged even the best passage irrelevant
+            best_rerank_score = final_results[0].get('cross_encoder_score')
+            if best_rerank_score is not None and best_rerank_score < config.RAG_MIN_RERANK_SCORE:
+                logger.warning(f"Best cross-encoder score {best_rerank_score:.2f} is below "
+                               f"{config.RAG_MIN_RERANK_SCORE}; skipping answer generation")
+                yield {'type': 'result', 'data': {
+                    'answer': 'The retrieved passages do not appear to address this question. Try rephrasing it or asking about topics covered by the papers.',
+                    'sources': self._format_sources(final_results),
+                    'confidence': 'low',
+                    'method': 'hybrid_rag',
+                    'retrieval_methods': {
+                        'bm25_count': len(bm25_results),
+                        'semantic_count': len(semantic_results),
+                        'after_fusion': len(fused_results),
+                        'after_dedup': len(unique_results)
+                    }
+                }}
+                return
             
             # Step 6: Enrich with knowledge graph
             logger.info("Enriching with knowledge graph...")
@@ -288,9 +610,14 @@ class HybridRAGEngine:
             logger.info("Building context...")
             context = self._build_context(enriched)
             
-            # Step 8: Generate answer
+            # Step 8: Generate answer, passing tokens through
             logger.info("Generating answer with LLM...")
-            answer_data = self._generate_answer(question, context, enriched)
+            answer_data = None
+            for event in self._stream_answer(question, context, enriched):
+                if event['type'] == 'result':
+                    answer_data = event['data']
+                else:
+                    yield event
             answer_data['sources'] = self._format_sources(enriched)
             answer_data['method'] = 'hybrid_rag'
             answer_data['retrieval_methods'] = {
@@ -305,25 +632,172 @@ class HybridRAGEngine:
                 'papers_enriched': kg_enrichments,
                 'total_papers': len(final_results),
                 'graph_used': kg_enrichments > 0,
-                'total_nodes': knowledge_graph.graph.number_of_nodes(),
-                'total_edges': knowledge_graph.graph.number_of_edges()
+                'total_nodes': get_knowledge_graph().graph.number_of_nodes(),
+                'total_edges': get_knowledge_graph().graph.number_of_edges()
             }
             
             if kg_enrichments > 0:
                 logger.info(f"🔗 Knowledge graph enriched {kg_enrichments}/{len(final_results)} papers")
             
             logger.info(f"✅ Hybrid RAG completed: {answer_data['confidence']} confidence")
-            return answer_data
+            
+            if config.ENABLE_CACHING and answer_data['confidence'] != 'error':
+                self._save_cached_answer(cache_key, answer_data)
+            
+            yield {'type': 'result', 'data': answer_data}
             
         except Exception as e:
             logger.error(f"❌ Hybrid RAG error: {e}", exc_info=True)
-            return {
+            yield {'type': 'result', 'data': {
                 'answer': f"Error processing query: {str(e)}",
                 'sources': [],
                 'confidence': 'error',
                 'error': str(e),
                 'method': 'hybrid_rag'
-            }
+            }}
+    
+    def query_batch(self, questions: List[str], job_id: Optional[int] = None,
+                    specific_paper_id: Optional[int] = None) -> List[Dict]:
+        """
+        Answer several questions at once.
+        
+        Semantic retrieval for all questions is a single vector search (one
+        embedding batch), and the per-question pipelines then run concurrently
+        so ollama can batch their generations.
+        
+        Args:
+            questions: User questions
+            job_id: Optional job filter
+            specific_paper_id: Optional paper filter
+        
+        Returns:
+            One answer dict per question, in input order
+        """
+        if not questions:
+            return []
+        
+        try:
+            semantic_batch = vector_db.search_batch(
+                questions,
+                top_k=20,
+                filter_job_id=job_id,
+                filter_paper_id=specific_paper_id
+            )
+        except Exception as e:
+            logger.warning(f"Batched semantic retrieval failed: {e}")
+            semantic_batch = [None] * len(questions)
+        # A None entry (failed search) makes query() retrieve that question itself
+        
+        def answer(question, semantic_results):
+            return self.query(question, job_id=job_id, specific_paper_id=specific_paper_id,
+                              semantic_results=semantic_results)
+        
+        workers = min(len(questions), config.RAG_BATCH_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hybrid_rag_batch') as pool:
+            return list(pool.map(answer, questions, semantic_batch))
+    
+    async def query_async(self, question: str, job_id: Optional[int] = None,
+                          specific_paper_id: Optional[int] = None) -> Dict:
+        """
+        Awaitable query() for asyncio front-ends.
+        
+        The pipeline runs on a worker thread, so the event loop keeps serving
+        other requests while retrieval and generation block on I/O.
+        
+        Args:
+            question: User's question
+            job_id: Optional job filter
+            specific_paper_id: Optional paper filter
+        
+        Returns:
+            Comprehensive answer with sources
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.async_pool,
+            functools.partial(self.query, question, job_id, specific_paper_id)
+        )
+    
+    async def query_stream_async(self, question: str, job_id: Optional[int] = None,
+                                 specific_paper_id: Optional[int] = None) -> AsyncIterator[Dict]:
+        """
+        Async iterator over query_stream() events for asyncio front-ends.
+        
+        Each event is produced on a worker thread; tokens are yielded as soon
+        as the LLM streams them.
+        """
+        loop = asyncio.get_running_loop()
+        events = self.query_stream(question, job_id, specific_paper_id)
+        
+        while True:
+            event = await loop.run_in_executor(self.async_pool, next, events, None)
+            if event is None:
+                return
+            yield event
+    
+    def _query_cache_key(self, question: str, job_id: Optional[int],
+                         specific_paper_id: Optional[int]) -> str:
+        """
+        Cache key for a query.
+        
+        Covers everything that shapes the answer: the retrieval size, the model,
+        and both indexes (BM25 fingerprint and vector DB stamp), so reindexing
+        invalidates it while restarts and no-op refreshes do not.
+        """
+        raw = (f"{question}|{job_id}|{specific_paper_id}|{config.RAG_TOP_K_RESULTS}|{self.model}|"
+               f"{self.bm25.fingerprint}|{vector_db.index_stamp}")
+        return hashlib.sha256(raw.encode()).hexdigest()
+    
+    def _load_cached_answer(self, cache_key: str) -> Optional[Dict]:
+        """Return a cached answer for this key from memory or disk, or None on miss."""
+        with self._answer_cache_lock:
+            payload = self._answer_cache.get(cache_key)
+            if payload is not None:
+                self._answer_cache.move_to_end(cache_key)
+        
+        if payload is None:
+            if not cache_exists(cache_key, 'rag_queries'):
+                return None
+            
+            cache_path = get_cache_path(cache_key, 'rag_queries')
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    payload = f.read()
+                os.utime(cache_path)  # Mark as recently used for LRU eviction
+            except Exception as e:
+                logger.warning(f"Query cache read error: {e}")
+                return None
+            self._remember_answer(cache_key, payload)
+        
+        try:
+            # Each hit gets its own copy, so callers may modify it freely
+            cached_answer = json.loads(payload)
+        except Exception as e:
+            logger.warning(f"Query cache read error: {e}")
+            return None
+        cached_answer['from_cache'] = True
+        return cached_answer
+    
+    def _save_cached_answer(self, cache_key: str, answer_data: Dict):
+        """Write an answer to the query cache and evict the least recently used entries."""
+        try:
+            payload = json.dumps(answer_data, ensure_ascii=False, default=str)
+            self._remember_answer(cache_key, payload)
+            
+            cache_path = get_cache_path(cache_key, 'rag_queries')
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            prune_cache('rag_queries', config.RAG_QUERY_CACHE_SIZE)
+        except Exception as e:
+            logger.warning(f"Query cache write error: {e}")
+    
+    def _remember_answer(self, cache_key: str, payload: str):
+        """Keep a serialized answer in the in-memory LRU."""
+        with self._answer_cache_lock:
+            self._answer_cache[cache_key] = payload
+            self._answer_cache.move_to_end(cache_key)
+            while len(self._answer_cache) > config.RAG_QUERY_MEMORY_CACHE_SIZE:
+                self._answer_cache.popitem(last=False)
     
     def _preprocess_query(self, query: str) -> str:
         """Preprocess query for better keyword matching."""
@@ -337,6 +811,24 @@ class HybridRAGEngine:
         
         return query
     
+    def _retrieve_parallel(self, bm25_query: str, semantic_query: str, top_k: int = 20,
+                          job_id: Optional[int] = None,
+                          paper_id: Optional[int] = None,
+                          semantic_results: Optional[List[Dict]] = None) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Run BM25 and semantic retrieval concurrently and return both result lists.
+        
+        Semantic search is skipped when semantic_results were already retrieved.
+        """
+        if semantic_results is not None:
+            return self._retrieve_bm25(bm25_query, top_k, job_id), semantic_results
+        
+        bm25_future = self.retrieval_pool.submit(self._retrieve_bm25, bm25_query, top_k, job_id)
+        semantic_future = self.retrieval_pool.submit(self._retrieve_semantic, semantic_query, top_k, job_id, paper_id)
+        
+        # Both helpers catch their own errors and return [] on failure
+        return bm25_future.result(), semantic_future.result()
+    
     def _retrieve_bm25(self, query: str, top_k: int = 20, job_id: Optional[int] = None) -> List[Dict]:
         """Retrieve using BM25 keyword matching."""
         try:
@@ -439,76 +931,56 @@ class HybridRAGEngine:
         else:
             return str(result.get('metadata', {}).get('paper_id', ''))
     
+    def _get_cross_encoder(self) -> CrossEncoder:
+        """Load the cross-encoder model on first use."""
+        if self.cross_encoder is None:
+            logger.info(f"Loading cross-encoder model: {config.CROSS_ENCODER_MODEL}")
+            self.cross_encoder = CrossEncoder(
+                config.CROSS_ENCODER_MODEL,
+                max_length=256,
+                device=config.EMBEDDING_DEVICE
+            )
+        return self.cross_encoder
+    
     def _rerank_with_cross_encoder(self, query: str, results: List[Dict]) -> List[Dict]:
         """
-        Rerank results using LLM-based cross-encoder scoring.
-        More accurate but slower - only use for top candidates.
-        Falls back to RRF order if LLM call fails.
+        Rerank results using a cross-encoder model.
+        Scores all (query, passage) pairs of the top candidates in one batched forward pass.
+        Falls back to RRF order if scoring fails.
         """
+        # Too few candidates to be worth a model pass: keep RRF order
+        if len(results) < config.CROSS_ENCODER_MIN_CANDIDATES:
+            return results
+        
         try:
-            if len(results) <= 5:
-                # If few results, return as-is
-                return results
-            
             # Take top candidates for reranking
             candidates = results[:min(10, len(results))]
             
-            # Build comparison text
-            comparison_text = ""
-            for i, result in enumerate(candidates):
+            # BM25 hits carry no passage text; load their section content in one query
+            bm25_texts = self.bm25._doc_texts(
+                [r['doc_id'] for r in candidates if not r.get('text') and 'doc_id' in r]
+            )
+            
+            # Build (query, passage) pairs
+            pairs = []
+            for result in candidates:
                 metadata = result.get('metadata', {})
-                section = metadata.get('section_type', metadata.get('section', 'Unknown'))
                 title = metadata.get('title', 'Unknown')[:50]
+                text = result.get('text') or bm25_texts.get(result.get('doc_id'), '')
                 
-                text = result.get('text', '')[:150] if 'text' in result else \
-                       result.get('bm25_score', 0) and "BM25 result" or "Semantic result"
-                
-                comparison_text += f"\n[Result {i+1}] {title} ({section})\n{text}\n"
+                pairs.append((query, f"{title}\n{text[:512]}"))
             
-            prompt = f"""Rerank these search results by relevance. Return ONLY the ranking.
-
-QUERY: {query}
-
-RESULTS:
-{comparison_text}
-
-Respond with ONLY result numbers (1-indexed), comma-separated, most relevant first.
-Example: "3,1,5,2"
-NUMBERS ONLY:"""
-
             logger.debug("Starting cross-encoder reranking...")
-            response = ollama.chat(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                options={"temperature": 0.1, "num_predict": 30}
-            )
-            
-            ranking_str = response['message']['content'].strip().replace(" ", "")
-            logger.debug(f"Cross-encoder response: {ranking_str}")
-            
-            # Parse rankings
-            ranks = []
-            for part in ranking_str.split(','):
-                try:
-                    rank = int(part.strip()) - 1
-                    if 0 <= rank < len(candidates):
-                        ranks.append(rank)
-                except ValueError:
-                    continue
+            scores = np.asarray(self._get_cross_encoder().predict(pairs, batch_size=16))
             
-            if not ranks:
-                logger.warning("Failed to parse cross-encoder ranking, using RRF order")
-                return results
-            
-            # Reorder results
+            # Reorder candidates by descending cross-encoder score
             reranked = []
-            for rank in ranks:
-                if 0 <= rank < len(candidates):
-                    candidates[rank]['cross_encoder_rank'] = len(reranked) + 1
-                    reranked.append(candidates[rank])
+            for idx in np.argsort(-scores, kind='stable'):
+                candidates[idx]['cross_encoder_rank'] = len(reranked) + 1
+                candidates[idx]['cross_encoder_score'] = float(scores[idx])
+                reranked.append(candidates[idx])
             
             # Add remaining results
-            reranked.extend(candidates[len(reranked):])
             reranked.extend(results[len(candidates):])
             
             logger.info(f"Cross-encoder reranking applied to {len(candidates)} results")
@@ -518,92 +990,122 @@ NUMBERS ONLY:"""
             logger.warning(f"Cross-encoder reranking failed ({type(e).__name__}: {e}), using RRF order")
             return results
     
-    def _deduplicate_results(self, results: List[Dict]) -> List[Dict]:
-        """Remove duplicate chunks, keeping highest scoring ones."""
-        seen_ids = {}
+    def _deduplicate_results(self, results: List[Dict], limit: Optional[int] = None) -> List[Dict]:
+        """
+        Remove duplicate chunks, keeping highest scoring ones.
+        
+        Results arrive ranked, so scanning stops once `limit` unique results are collected.
+        """
+        seen = set()
         unique = []
         
         for result in results:
-            # Get paper ID
-            paper_id = result.get('metadata', {}).get('paper_id')
-            section = result.get('metadata', {}).get('section_type')
+            metadata = result.get('metadata', {})
+            key = (metadata.get('paper_id'), metadata.get('section_type'))
             
-            key = (paper_id, section)
+            if key in seen:
+                continue
+            
+            seen.add(key)
+            unique.append(result)
             
-            if key not in seen_ids:
-                seen_ids[key] = True
-                unique.append(result)
+            if limit is not None and len(unique) >= limit:
+                break
         
         logger.info(f"Deduplicated: {len(results)} -> {len(unique)} results")
         return unique
     
     def _enrich_with_context(self, results: List[Dict], job_id: Optional[int] = None) -> List[Dict]:
         """Enrich results with knowledge graph and additional context."""
-        enriched = []
+        paper_ids = [r.get('metadata', {}).get('paper_id') for r in results]
         
-        for result in results:
-            paper_id = result.get('metadata', {}).get('paper_id')
-            
+        try:
+            # One batched graph lookup for all papers, filtered by job_id
+            related_map = get_knowledge_graph().find_related_papers_batch(
+                [pid for pid in paper_ids if pid], max_results=3, job_id=job_id
+            )
+        except Exception as e:
+            logger.debug(f"Could not get related papers: {e}")
+            related_map = {}
+        
+        for result, paper_id in zip(results, paper_ids):
             if paper_id:
-                try:
-                    # Get related papers from knowledge graph, filtered by job_id
-                    related = knowledge_graph.find_related_papers(paper_id, max_results=3, job_id=job_id)
-                    result['related_papers'] = related
-                except:
-                    result['related_papers'] = []
-            
-            enriched.append(result)
+                result['related_papers'] = related_map.get(paper_id, [])
         
-        return enriched
+        return results
     
     def _build_context(self, results: List[Dict]) -> str:
         """Build final context from results, enhanced with knowledge graph relationships."""
-        from collections import defaultdict
-        
         papers = defaultdict(list)
         for result in results:
             paper_id = result['metadata'].get('paper_id')
             papers[paper_id].append(result)
         
+        # At most 3 chunks from each of the first 10 papers reach the prompt; each
+        # gets an equal share of the budget up front, so no chunk is copied in
+        # full only to be cut when the budget runs out
+        groups = [chunks[:3] for chunks in itertools.islice(papers.values(), 10) if chunks]
+        chunk_count = sum(len(chunks) for chunks in groups)
+        chunk_chars = max(200, config.RAG_MAX_CONTEXT_LENGTH // max(1, chunk_count)) * _CHARS_PER_WORD
+        
         context_parts = []
+        chars_left = config.RAG_MAX_CONTEXT_LENGTH * _CHARS_PER_WORD
+        truncated = False
         
-        for paper_id, chunks in list(papers.items())[:10]:  # Limit to 10 papers
-            if not chunks:
-                continue
-            
+        for chunks in groups:
             first = chunks[0]
-            metadata = first['metadata']
+            mget = first['metadata'].get
             
-            paper_header = f"""
+            block_parts = [f"""
 ═══════════════════════════════════════
-PAPER: {metadata.get('title', 'Unknown')[:80]}
-ArXiv: {metadata.get('arxiv_id', 'N/A')} | Section: {metadata.get('section_type', 'N/A')}
+PAPER: {mget('title', 'Unknown')[:80]}
+ArXiv: {mget('arxiv_id', 'N/A')} | Section: {mget('section_type', 'N/A')}
 ═══════════════════════════════════════
-"""
-            content = "\n".join([c.get('text', '') for c in chunks][:3])
+""", "\n".join([self._clip_text(c.get('text', ''), chunk_chars) for c in chunks])]
             
             # Add knowledge graph context if available
-            kg_context = ""
-            if first.get('related_papers'):
-                related = first['related_papers']
-                if related:
-                    kg_context = "\n[Related Papers in Graph]: "
-                    for rel in related[:3]:  # Show top 3 related
-                        kg_context += f"\n  • {rel.get('title', 'Unknown')[:60]} ({rel.get('relationship', 'related')})"
+            related = first.get('related_papers')
+            if related:
+                block_parts.append("\n[Related Papers in Graph]: ")
+                for rel in related[:3]:  # Show top 3 related
+                    block_parts.append(f"\n  • {rel.get('title', 'Unknown')[:60]} ({rel.get('relationship', 'related')})")
+            
+            block = "".join(block_parts)
             
-            context_parts.append(paper_header + content + kg_context)
+            # Stop assembling once the character budget is spent; only the overflowing
+            # block is cut, at its last space or newline within the budget
+            if len(block) > chars_left:
+                cut = max(block.rfind(' ', 0, chars_left + 1), block.rfind('\n', 0, chars_left + 1))
+                if cut > 0:
+                    context_parts.append(block[:cut])
+                truncated = True
+                break
+            
+            context_parts.append(block)
+            chars_left -= len(block)
         
         full_context = "\n".join(context_parts)
         
-        # Truncate if needed
-        words = full_context.split()
-        if len(words) > config.RAG_MAX_CONTEXT_LENGTH:
-            full_context = " ".join(words[:config.RAG_MAX_CONTEXT_LENGTH]) + "\n[Context truncated...]"
+        if truncated:
+            full_context += "\n[Context truncated...]"
         
         return full_context
     
-    def _generate_answer(self, question: str, context: str, sources: List[Dict]) -> Dict:
-        """Generate answer using LLM, leveraging knowledge graph relationships."""
+    @staticmethod
+    def _clip_text(text: str, max_chars: int) -> str:
+        """Cut text to at most max_chars at a word boundary, marking the cut."""
+        if len(text) <= max_chars:
+            return text
+        
+        cut = max(text.rfind(' ', 0, max_chars + 1), text.rfind('\n', 0, max_chars + 1))
+        return (text[:cut] if cut > 0 else text[:max_chars]) + " [...]"
+    
+    def _stream_answer(self, question: str, context: str, sources: List[Dict]) -> Iterator[Dict]:
+        """
+        Generate answer using LLM, leveraging knowledge graph relationships.
+        
+        Yields token events while the answer is generated, then one result event.
+        """
         try:
             # Extract knowledge graph relationship information from sources
             kg_info = []
@@ -612,38 +1114,26 @@ ArXiv: {metadata.get('arxiv_id', 'N/A')} | Section: {metadata.get('section_type'
                     for rel in source['related_papers'][:2]:
                         kg_info.append(f"• {source['metadata'].get('title', 'Paper')[:40]} connects to {rel.get('title', 'Unknown')[:40]} via {rel.get('relationship', 'relationship')}")
             
-            kg_section = ""
-            if kg_info:
-                kg_section = f"\n\nKNOWLEDGE GRAPH CONNECTIONS:\n" + "\n".join(kg_info[:5])
+            kg_section = _KG_SECTION_HEADER + "\n".join(kg_info[:5]) if kg_info else ""
+            prompt = _ANSWER_PROMPT.format_map({'context': context, 'kg_section': kg_section, 'question': question})
             
-            prompt = f"""You are a research expert analyzing scientific papers. Answer the following question based ONLY on the provided research context.
-
-CONTEXT FROM RESEARCH PAPERS:
-{context}{kg_section}
-
-QUESTION: {question}
-
-INSTRUCTIONS:
-1. Answer comprehensively using information from the papers
-2. Cite specific papers: [Paper Title - ArXiv ID]
-3. If papers provide different perspectives, mention all
-4. Use knowledge graph connections to show how papers relate to each other
-5. Be specific about methods, results, and findings
-6. If information is insufficient, clearly state it
-7. When multiple papers address the same topic, discuss their relationships and differences
-
-ANSWER:"""
-
-            response = ollama.chat(
+            pieces = []
+            for chunk in self._llm.chat(
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
+                stream=True,
                 options={
                     "temperature": config.RAG_TEMPERATURE,
                     "num_predict": 800
-                }
-            )
+                },
+                keep_alive=config.OLLAMA_KEEP_ALIVE
+            ):
+                piece = chunk['message']['content']
+                if piece:
+                    pieces.append(piece)
+                    yield {'type': 'token', 'content': piece}
             
-            answer = response['message']['content'].strip()
+            answer = ''.join(pieces).strip()
             
             # Determine confidence
             papers_cited = len(set(s['metadata'].get('paper_id') for s in sources))
@@ -656,49 +1146,60 @@ ANSWER:"""
             else:
                 confidence = 'low'
             
-            return {
+            yield {'type': 'result', 'data': {
                 'answer': answer,
                 'confidence': confidence,
                 'papers_analyzed': papers_cited,
                 'average_score': avg_score,
                 'relationships_used': len(kg_info) > 0
-            }
+            }}
             
         except Exception as e:
             logger.error(f"Answer generation error: {e}")
-            return {
+            yield {'type': 'result', 'data': {
                 'answer': f"Error: {str(e)}",
                 'confidence': 'error'
-            }
+            }}
     
     def _format_sources(self, results: List[Dict]) -> List[Dict]:
         """Format sources for display."""
         papers_seen = {}
         sources = []
         
-        for i, result in enumerate(results):
+        for i, result in enumerate(results, 1):
             metadata = result['metadata']
-            paper_id = metadata.get('paper_id')
-            
-            if paper_id not in papers_seen:
-                papers_seen[paper_id] = len(papers_seen) + 1
+            mget = metadata.get
+            rget = result.get
+            paper_id = mget('paper_id')
             
-            paper_num = papers_seen[paper_id]
+            # Fallback keys are only looked up when the primary key is missing
+            section = metadata['section_type'] if 'section_type' in metadata else mget('section', 'Unknown')
+            semantic = 'relevance_score' in result
             
             sources.append({
-                'source_number': i + 1,
-                'paper_number': paper_num,
+                'source_number': i,
+                'paper_number': papers_seen.setdefault(paper_id, len(papers_seen) + 1),
                 'paper_id': paper_id,
-                'title': metadata.get('title', 'Unknown'),
-                'arxiv_id': metadata.get('arxiv_id', 'Unknown'),
-                'section': metadata.get('section_type', metadata.get('section', 'Unknown')),
-                'relevance_score': result.get('relevance_score', result.get('bm25_score', 0)),
-                'retrieval_method': 'semantic' if 'relevance_score' in result else 'bm25',
-                'rrf_score': result.get('rrf_score'),
-                'fusion_info': result.get('fusion_info')
+                'title': mget('title', 'Unknown'),
+                'arxiv_id': mget('arxiv_id', 'Unknown'),
+                'section': section,
+                'relevance_score': result['relevance_score'] if semantic else rget('bm25_score', 0),
+                'retrieval_method': 'semantic' if semantic else 'bm25',
+                'rrf_score': rget('rrf_score'),
+                'fusion_info': rget('fusion_info')
             })
         
         return sources
 
-# Global instance
-hybrid_rag_engine = HybridRAGEngine()
+# Global instance, created on first use so importing this module doesn't load the BM25 index
+_hybrid_rag_engine = None
+_hybrid_rag_engine_lock = threading.Lock()
+
+def get_hybrid_rag_engine() -> HybridRAGEngine:
+    """Return the shared HybridRAGEngine, initializing it on first call."""
+    global _hybrid_rag_engine
+    if _hybrid_rag_engine is None:
+        with _hybrid_rag_engine_lock:
+            if _hybrid_rag_engine is None:
+                _hybrid_rag_engine = HybridRAGEngine()
+    return _hybrid_rag_engine
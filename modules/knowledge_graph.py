@@ -1,14 +1,112 @@
 # modules/knowledge_graph.py - Knowledge Graph Management
 import os
 import json
+import gzip
+import heapq
+import uuid
 import pickle
+import threading
+import functools
 from typing import List, Dict, Set, Tuple, Optional
 import networkx as nx
 from collections import Counter, defaultdict
+import numpy as np
 from config import config
 from modules.utils import logger
 from modules.database import db
 
+# msgpack is optional: when installed, graph snapshots are written as a compact
+# columnar msgpack file instead of a gzip-compressed pickle
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Compact codes used by the CSR adjacency snapshot
+_NODE_OTHER, _NODE_PAPER, _NODE_AUTHOR, _NODE_CONCEPT = 0, 1, 2, 3
+_NODE_TYPE_CODES = {'paper': _NODE_PAPER, 'author': _NODE_AUTHOR, 'concept': _NODE_CONCEPT}
+
+# CSR arrays saved as .npy files next to the graph snapshot
+_CSR_NODE_ARRAYS = ('node_types', 'node_jobs', 'paper_ids', 'in_degree')
+_CSR_DIRECTIONS = ('out', 'in')
+_CSR_PARTS = ('indptr', 'indices', 'rel')
+
+# Edge relationships are stored as a bitmask in the 'rel_mask' edge attribute
+REL_AUTHORED, REL_CITES, REL_DISCUSSES = 1, 2, 4
+_REL_CODES = {'authored': REL_AUTHORED, 'cites': REL_CITES, 'discusses': REL_DISCUSSES}
+
+def relationship_name(edge_data: Dict) -> str:
+    """Name of an edge's relationship (the first one, if several are set)."""
+    rel_mask = edge_data.get('rel_mask', 0)
+    for name, bit in _REL_CODES.items():
+        if rel_mask & bit:
+            return name
+    return edge_data.get('relationship', 'related')
+
+# Long paper text is read from the database on demand: field -> (table, paper id column)
+_PAPER_TEXT_FIELDS = {
+    'abstract': ('papers', 'id'),
+    'main_problem': ('paper_contributions', 'paper_id'),
+    'key_innovation': ('paper_contributions', 'paper_id'),
+    'limitations': ('paper_contributions', 'paper_id'),
+    'research_gaps': ('paper_contributions', 'paper_id')
+}
+
+# Common technical terms (simplified - can use NLP libraries)
+_IMPORTANT_TERMS = frozenset([
+    'neural', 'network', 'learning', 'deep', 'machine', 'model',
+    'algorithm', 'optimization', 'training', 'architecture',
+    'transformer', 'attention', 'convolution', 'lstm', 'gru'
+])
+
+def _job_id_for(paper_id: int) -> int:
+    """
+    Look up a paper's job_id. Raises KeyError for unknown papers.
+    
+    Not cached: a re-ingested paper can move to another job, and its node
+    must pick up the new job_id.
+    """
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT job_id FROM papers WHERE id = ?', (paper_id,))
+        row = cursor.fetchone()
+    if row is None:
+        raise KeyError(paper_id)
+    return row['job_id']
+
+def _job_ids_for(paper_ids: List[int], chunk_size: int = 500) -> Dict[int, int]:
+    """Look up job_ids for many papers, in chunks below SQLite's parameter limit."""
+    job_ids = {}
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        for start in range(0, len(paper_ids), chunk_size):
+            chunk = paper_ids[start:start + chunk_size]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f'SELECT id, job_id FROM papers WHERE id IN ({placeholders})', chunk)
+            job_ids.update((row['id'], row['job_id']) for row in cursor.fetchall())
+    return job_ids
+
+@functools.lru_cache(maxsize=65536)
+def _extract_year(date_str: str) -> int:
+    """Extract year from date string."""
+    try:
+        if date_str:
+            return int(date_str[:4])
+    except:
+        pass
+    return 0
+
+@functools.lru_cache(maxsize=65536)
+def _normalize_author_name(name: str) -> str:
+    """Normalize author name for matching."""
+    normalized = name.lower().strip()
+    return f"author_{normalized.replace(' ', '_')}"
+
+@functools.lru_cache(maxsize=16384)
+def _tokset(text: str) -> frozenset:
+    """Lowercased word set of a title (cached; reference titles repeat across papers)."""
+    return frozenset(text.lower().split())
+
 class KnowledgeGraph:
     """
     Builds and manages a knowledge graph of research papers.
@@ -20,103 +118,168 @@ class KnowledgeGraph:
     
     def __init__(self):
         """Initialize knowledge graph."""
-        self.graph = nx.MultiDiGraph()  # Directed graph with multiple edges
+        self.graph = nx.DiGraph()  # Directed graph; one edge per pair with a relationship bitmask
         self.graph_path = config.GRAPH_DB_PATH
+        self.compressed_graph_path = self.graph_path + '.gz'
+        self.msgpack_graph_path = self.graph_path + '.msgpack'
+        self.wal_path = self.graph_path + '.wal'
+        self.csr_dir = self.graph_path + '.csr'
+        
+        # Graph writes since the last snapshot, appended to the WAL per paper
+        self._pending_wal: List[Dict] = []
+        self._wal_records = 0
+        
+        # Node partitions by type; dicts keep graph insertion order (rebuilt on load).
+        # Paper values are insertion sequence numbers, and _paper_order maps a
+        # sequence number back to its node id.
+        self._paper_nodes: Dict[str, int] = {}
+        self._paper_order: List[str] = []
+        self._author_nodes: Dict[str, None] = {}
+        self._concept_nodes: Dict[str, None] = {}
+        
+        # Title token index for citation matching, keyed by paper sequence number
+        # so candidate sets hold small ints rather than node id strings (rebuilt on load)
+        self._paper_title_tokens: Dict[int, frozenset] = {}
+        self._token_to_papers: Dict[str, Set[int]] = defaultdict(set)
+        
+        # Read-only CSR snapshot of the adjacency, rebuilt lazily after writes
+        self._csr: Optional[Dict] = None
+        self._csr_dirty = True
         
         # Load existing graph if available
-        if os.path.exists(self.graph_path):
+        snapshot_paths = (self.msgpack_graph_path, self.compressed_graph_path, self.graph_path, self.wal_path)
+        if any(os.path.exists(path) for path in snapshot_paths):
             self.load_graph()
             logger.info(f"Loaded knowledge graph: {self.graph.number_of_nodes()} nodes, {self.graph.number_of_edges()} edges")
         else:
             logger.info("Initialized new knowledge graph")
     
-    def add_paper(self, paper_id: int, paper_data: Dict) -> bool:
+    def add_paper(self, paper_id: int, paper_data: Dict, job_id: Optional[int] = None) -> bool:
         """
         Add a paper node to the graph.
         
         Args:
             paper_id: Database paper ID
             paper_data: Complete paper data
+            job_id: Job the paper belongs to (looked up from the database if omitted)
         
         Returns:
             True if successful
         """
         try:
-            metadata = paper_data.get('metadata', {})
-            contributions = paper_data.get('contributions', {})
+            # Get job_id from database for isolation unless the caller knows it
+            if job_id is None:
+                try:
+                    job_id = _job_id_for(paper_id)
+                except KeyError:
+                    pass
+                except Exception as e:
+                    logger.warning(f"Could not fetch job_id for paper {paper_id}: {e}")
             
-            # Get job_id from database for isolation
-            job_id = None
+            self._add_paper_nodes(paper_id, paper_data, job_id)
+            self._flush_wal()
+            logger.info(f"Added paper {paper_id} to knowledge graph")
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error adding paper to graph: {e}", exc_info=True)
+            return False
+    
+    def add_papers(self, items: List[Tuple[int, Dict]], persist: bool = False) -> int:
+        """
+        Add many papers to the graph in one batch.
+        
+        Job IDs are fetched with a single query and the WAL is appended once;
+        the CSR snapshot is left dirty and rebuilt once on the next query.
+        
+        Args:
+            items: (paper_id, paper_data) pairs
+            persist: Write a full graph snapshot when done
+        
+        Returns:
+            Number of papers added
+        """
+        job_ids = {}
+        try:
+            job_ids = _job_ids_for([paper_id for paper_id, _ in items])
+        except Exception as e:
+            logger.warning(f"Could not fetch job_ids for {len(items)} papers: {e}")
+        
+        added = 0
+        for paper_id, paper_data in items:
             try:
-                with db.get_connection() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute('SELECT job_id FROM papers WHERE id = ?', (paper_id,))
-                    row = cursor.fetchone()
-                    if row:
-                        job_id = row['job_id']
+                self._add_paper_nodes(paper_id, paper_data, job_ids.get(paper_id))
+                added += 1
             except Exception as e:
-                logger.warning(f"Could not fetch job_id for paper {paper_id}: {e}")
-            
-            # Add paper node
-            self.graph.add_node(
-                f"paper_{paper_id}",
-                type='paper',
-                paper_id=paper_id,
-                job_id=job_id if job_id is not None else 0,  # Use 0 if None
-                arxiv_id=metadata.get('arxiv_id', ''),
-                title=metadata.get('title', ''),
-                year=self._extract_year(metadata.get('published', '')),
-                citation_count=metadata.get('citation_count', 0),
-                abstract=metadata.get('abstract', ''),
-                main_problem=contributions.get('main_problem', ''),
-                key_innovation=contributions.get('key_innovation', ''),
-                limitations=contributions.get('limitations', ''),
-                research_gaps=contributions.get('research_gaps', '')
-            )
+                logger.error(f"Error adding paper {paper_id} to graph: {e}", exc_info=True)
+        
+        self._flush_wal()
+        if persist:
+            self.save_graph()
+        
+        logger.info(f"Added {added}/{len(items)} papers to knowledge graph")
+        return added
+    
+    def _add_paper_nodes(self, paper_id: int, paper_data: Dict, job_id: Optional[int]):
+        """Add a paper with its author and concept nodes and edges (no database access)."""
+        metadata = paper_data.get('metadata', {})
+        paper_node = f"paper_{paper_id}"
+        
+        # Add paper node (structural fields only; long text stays in the database)
+        self._add_node(
+            paper_node,
+            type='paper',
+            paper_id=paper_id,
+            job_id=job_id if job_id is not None else 0,  # Use 0 if None
+            arxiv_id=metadata.get('arxiv_id', ''),
+            title=metadata.get('title', ''),
+            year=_extract_year(metadata.get('published', '')),
+            citation_count=metadata.get('citation_count', 0)
+        )
+        if paper_node not in self._paper_nodes:
+            self._paper_nodes[paper_node] = len(self._paper_order)
+            self._paper_order.append(paper_node)
+        self._index_paper_title(self._paper_nodes[paper_node], metadata.get('title', ''))
+        self._csr_dirty = True
+        
+        # Add author nodes and relationships
+        authors = metadata.get('authors', [])
+        for author in authors:
+            author_id = _normalize_author_name(author)
             
-            # Add author nodes and relationships
-            authors = metadata.get('authors', [])
-            for author in authors:
-                author_id = self._normalize_author_name(author)
-                
-                if not self.graph.has_node(author_id):
-                    self.graph.add_node(
-                        author_id,
-                        type='author',
-                        name=author
-                    )
-                
-                self.graph.add_edge(
+            if not self.graph.has_node(author_id):
+                self._add_node(
                     author_id,
-                    f"paper_{paper_id}",
-                    relationship='authored'
+                    type='author',
+                    name=author
                 )
+                self._author_nodes[author_id] = None
             
-            # Extract and add concept nodes
-            if config.EXTRACT_CONCEPTS:
-                concepts = self._extract_concepts(paper_data)
-                for concept in concepts:
-                    concept_id = f"concept_{concept.lower().replace(' ', '_')}"
-                    
-                    if not self.graph.has_node(concept_id):
-                        self.graph.add_node(
-                            concept_id,
-                            type='concept',
-                            name=concept
-                        )
-                    
-                    self.graph.add_edge(
-                        f"paper_{paper_id}",
+            self._add_edge(
+                author_id,
+                paper_node,
+                relationship='authored'
+            )
+        
+        # Extract and add concept nodes
+        if config.EXTRACT_CONCEPTS:
+            concepts = self._extract_concepts(paper_data)
+            for concept in concepts:
+                concept_id = f"concept_{concept.lower().replace(' ', '_')}"
+                
+                if not self.graph.has_node(concept_id):
+                    self._add_node(
                         concept_id,
-                        relationship='discusses'
+                        type='concept',
+                        name=concept
                     )
-            
-            logger.info(f"Added paper {paper_id} to knowledge graph")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error adding paper to graph: {e}", exc_info=True)
-            return False
+                    self._concept_nodes[concept_id] = None
+                
+                self._add_edge(
+                    paper_node,
+                    concept_id,
+                    relationship='discusses'
+                )
     
     def link_citations(self, paper_id: int, references: List[Dict]) -> int:
         """
@@ -140,25 +303,31 @@ class KnowledgeGraph:
             # Try to match references with papers in database
             for ref in references:
                 # Simple matching by title similarity
-                ref_title = ref.get('title', '').lower()
+                ref_tokens = _tokset(ref.get('title', ''))
+                if not ref_tokens:
+                    continue
+                
+                # Only papers sharing at least one title word can match
+                candidates = set()
+                for token in ref_tokens:
+                    candidates.update(self._token_to_papers.get(token, ()))
                 
-                for node in self.graph.nodes():
-                    if node.startswith('paper_'):
-                        node_data = self.graph.nodes[node]
-                        node_title = node_data.get('title', '').lower()
-                        
-                        # Simple string matching (can be improved)
-                        if ref_title and node_title and self._title_similarity(ref_title, node_title) > 0.8:
-                            self.graph.add_edge(
-                                source_node,
-                                node,
-                                relationship='cites',
-                                reference_info=ref
-                            )
-                            links_created += 1
-                            break
+                # Link the first paper in node order (sequence numbers follow it)
+                # whose title similarity is above 0.8
+                for seq in sorted(candidates):
+                    if self._title_similarity(ref_tokens, self._paper_title_tokens[seq],
+                                              min_similarity=0.8) > 0.8:
+                        self._add_edge(
+                            source_node,
+                            self._paper_order[seq],
+                            relationship='cites'
+                        )
+                        links_created += 1
+                        break
             
             if links_created > 0:
+                self._csr_dirty = True
+                self._flush_wal()
                 logger.info(f"Created {links_created} citation links for paper {paper_id}")
             
             return links_created
@@ -180,92 +349,99 @@ class KnowledgeGraph:
             List of related papers with relationship info
         """
         try:
-            source_node = f"paper_{paper_id}"
-            
-            if not self.graph.has_node(source_node):
-                return []
-            
-            # Get source paper's job_id if not provided
-            if job_id is None:
-                job_id = self.graph.nodes[source_node].get('job_id')
-            
-            related = []
-            
-            # Papers that cite this paper
-            for predecessor in self.graph.predecessors(source_node):
-                if predecessor.startswith('paper_'):
-                    # Filter by job_id if specified
-                    if job_id is not None and self.graph.nodes[predecessor].get('job_id') != job_id:
-                        continue
-                    
-                    edge_data = self.graph.get_edge_data(predecessor, source_node)
-                    if edge_data and any(e.get('relationship') == 'cites' for e in edge_data.values()):
-                        related.append({
-                            'paper_id': int(predecessor.split('_')[1]),
-                            'relationship': 'cites_this',
-                            'title': self.graph.nodes[predecessor].get('title', '')
-                        })
-            
-            # Papers cited by this paper
-            for successor in self.graph.successors(source_node):
-                if successor.startswith('paper_'):
-                    # Filter by job_id if specified
-                    if job_id is not None and self.graph.nodes[successor].get('job_id') != job_id:
-                        continue
-                    
-                    edge_data = self.graph.get_edge_data(source_node, successor)
-                    if edge_data and any(e.get('relationship') == 'cites' for e in edge_data.values()):
-                        related.append({
-                            'paper_id': int(successor.split('_')[1]),
-                            'relationship': 'cited_by_this',
-                            'title': self.graph.nodes[successor].get('title', '')
-                        })
-            
-            # Papers by same authors
-            authors = [n for n in self.graph.predecessors(source_node) if n.startswith('author_')]
-            for author in authors:
-                for paper in self.graph.successors(author):
-                    if paper.startswith('paper_') and paper != source_node:
-                        # Filter by job_id if specified
-                        if job_id is not None and self.graph.nodes[paper].get('job_id') != job_id:
-                            continue
-                        
-                        related.append({
-                            'paper_id': int(paper.split('_')[1]),
-                            'relationship': 'same_author',
-                            'title': self.graph.nodes[paper].get('title', '')
-                        })
-            
-            # Papers with shared concepts
-            concepts = [n for n in self.graph.successors(source_node) if n.startswith('concept_')]
-            for concept in concepts:
-                for paper in self.graph.predecessors(concept):
-                    if paper.startswith('paper_') and paper != source_node:
-                        # Filter by job_id if specified
-                        if job_id is not None and self.graph.nodes[paper].get('job_id') != job_id:
-                            continue
-                        
-                        related.append({
-                            'paper_id': int(paper.split('_')[1]),
-                            'relationship': 'shared_concept',
-                            'concept': self.graph.nodes[concept].get('name', ''),
-                            'title': self.graph.nodes[paper].get('title', '')
-                        })
-            
-            # Remove duplicates and limit
-            seen = set()
-            unique_related = []
-            for item in related:
-                if item['paper_id'] not in seen:
-                    seen.add(item['paper_id'])
-                    unique_related.append(item)
-            
-            return unique_related[:max_results]
+            related = self._related_papers(self._get_csr(), paper_id, max_results, job_id)
+            return [dict(item) for item in related]  # Copies callers can modify
             
         except Exception as e:
             logger.error(f"Error finding related papers: {e}")
             return []
     
+    def _related_papers(self, csr: Dict, paper_id: int, max_results: int,
+                        job_id: Optional[int]) -> List[Dict]:
+        """
+        Traverse one CSR snapshot for the papers related to paper_id.
+        
+        Results are memoized on the snapshot, which is replaced after every
+        graph write. The returned list is the memoized one and must not be modified.
+        """
+        memo_key = (paper_id, max_results, job_id)
+        cached = csr['related_memo'].get(memo_key)
+        if cached is not None:
+            return cached
+        
+        source_node = f"paper_{paper_id}"
+        source = csr['node_index'].get(source_node)
+        if source is None:
+            return []
+        
+        # Get source paper's job_id if not provided
+        if job_id is None:
+            job_id = self.graph.nodes[source_node].get('job_id')
+        
+        node_ids = csr['node_ids']
+        paper_ids = csr['paper_ids']
+        
+        # Sections are generated lazily, so traversal stops once enough papers are found
+        related = {}  # node position -> related paper, first relationship wins
+        for relationship, positions, concepts in self._related_sections(csr, source, job_id):
+            concepts = concepts.tolist() if concepts is not None else [None] * len(positions)
+            for position, concept in zip(positions.tolist(), concepts):
+                if len(related) >= max_results:
+                    break
+                if position in related:
+                    continue
+                
+                paper = node_ids[position]
+                item = {
+                    'paper_id': int(paper_ids[position]),
+                    'relationship': relationship
+                }
+                if concept is not None:
+                    item['concept'] = self.graph.nodes[node_ids[concept]].get('name', '')
+                item['title'] = self.graph.nodes[paper].get('title', '')
+                related[position] = item
+            
+            if len(related) >= max_results:
+                break
+        
+        related = list(related.values())
+        csr['related_memo'][memo_key] = related
+        return related
+    
+    def find_related_papers_batch(self, paper_ids: List[int], max_results: int = 5,
+                                  job_id: Optional[int] = None) -> Dict[int, List[Dict]]:
+        """
+        Find related papers for several papers in one call.
+        
+        Retrieval results usually contain several chunks of the same paper, so
+        each distinct paper is traversed only once.
+        
+        Args:
+            paper_ids: Source paper IDs (duplicates allowed)
+            max_results: Maximum number of related papers per source paper
+            job_id: Optional job_id to filter related papers by
+        
+        Returns:
+            Dictionary mapping each source paper ID to its related papers
+        """
+        related = {}
+        
+        try:
+            csr = self._get_csr()  # One snapshot for the whole batch
+        except Exception as e:
+            logger.error(f"Error finding related papers: {e}")
+            return {paper_id: [] for paper_id in paper_ids}
+        
+        for paper_id in dict.fromkeys(paper_ids):  # Unique, order preserved
+            try:
+                related[paper_id] = [dict(item) for item in
+                                     self._related_papers(csr, paper_id, max_results, job_id)]
+            except Exception as e:
+                logger.error(f"Error finding related papers: {e}")
+                related[paper_id] = []
+        
+        return related
+    
     def get_research_overview(self) -> Dict:
         """
         Generate an overview of the research landscape.
@@ -274,49 +450,79 @@ class KnowledgeGraph:
             Dictionary with aggregated insights
         """
         try:
-            papers = [n for n in self.graph.nodes() if n.startswith('paper_')]
+            papers = self._paper_nodes
             
             # Aggregate research problems
             problems = []
             innovations = []
             gaps = []
             
-            for paper in papers:
-                node_data = self.graph.nodes[paper]
-                if node_data.get('main_problem'):
-                    problems.append(node_data['main_problem'])
-                if node_data.get('key_innovation'):
-                    innovations.append(node_data['key_innovation'])
-                if node_data.get('research_gaps'):
-                    gaps.append(node_data['research_gaps'])
+            # Contributions live in the database; fetch them for all papers in one query
+            try:
+                contributions = self._load_contributions()
+            except Exception as e:
+                logger.warning(f"Could not load contributions for overview: {e}")
+                contributions = {}
             
-            # Most common concepts
-            concepts = [n for n in self.graph.nodes() if n.startswith('concept_')]
-            concept_frequency = {}
-            for concept in concepts:
-                # Count papers discussing this concept
-                papers_count = len(list(self.graph.predecessors(concept)))
-                concept_frequency[self.graph.nodes[concept]['name']] = papers_count
+            # One pass over the papers fills the contribution lists and keeps the
+            # five most cited papers in a min-heap of (citations, -order, node data);
+            # the negated order makes earlier papers win ties, as heapq.nlargest does
+            influential_heap = []
+            node_attrs = self.graph.nodes
+            for order, paper in enumerate(papers):
+                node_data = node_attrs[paper]
+                entry = (node_data.get('citation_count', 0), -order, node_data)
+                if len(influential_heap) < 5:
+                    heapq.heappush(influential_heap, entry)
+                elif entry[:2] > influential_heap[0][:2]:
+                    heapq.heapreplace(influential_heap, entry)
+                
+                row = contributions.get(node_data.get('paper_id'))
+                if row is None:
+                    continue
+                if problem := row['main_problem']:
+                    problems.append(problem)
+                if innovation := row['key_innovation']:
+                    innovations.append(innovation)
+                if gap := row['research_gaps']:
+                    gaps.append(gap)
             
-            top_concepts = sorted(concept_frequency.items(), key=lambda x: x[1], reverse=True)[:10]
+            # Most common concepts, ranked by number of papers discussing them
+            concepts = self._concept_nodes
+            csr = self._get_csr()
+            concept_positions = np.flatnonzero(csr['node_types'] == _NODE_CONCEPT)
+            counts = csr['in_degree'][concept_positions]
             
-            # Most influential papers (by citations)
-            influential_papers = []
-            for paper in papers:
-                node_data = self.graph.nodes[paper]
-                influential_papers.append({
+            # Only concepts tied with or above the 10th largest count can rank;
+            # a stable sort of those keeps graph order among ties
+            candidates = np.arange(len(counts))
+            if len(counts) > 10:
+                threshold = np.partition(counts, len(counts) - 10)[len(counts) - 10]
+                candidates = np.flatnonzero(counts >= threshold)
+            top = candidates[np.argsort(-counts[candidates], kind='stable')][:10]
+            
+            top_concepts = [
+                (self.graph.nodes[csr['node_ids'][concept_positions[i]]]['name'], int(counts[i]))
+                for i in top.tolist()
+            ]
+            
+            # Most influential papers (by citations), from the heap filled above
+            influential_papers = [
+                {
                     'paper_id': node_data.get('paper_id'),
                     'title': node_data.get('title', ''),
-                    'citation_count': node_data.get('citation_count', 0)
-                })
-            
-            influential_papers.sort(key=lambda x: x['citation_count'], reverse=True)
+                    'citation_count': citation_count
+                }
+                for citation_count, _, node_data in sorted(
+                    influential_heap, key=lambda entry: entry[:2], reverse=True
+                )
+            ]
             
             return {
                 'total_papers': len(papers),
                 'total_concepts': len(concepts),
                 'top_concepts': top_concepts,
-                'most_influential_papers': influential_papers[:5],
+                'most_influential_papers': influential_papers,
                 'common_problems': problems[:5],
                 'key_innovations': innovations[:5],
                 'research_gaps': gaps[:5]
@@ -326,6 +532,47 @@ class KnowledgeGraph:
             logger.error(f"Error generating overview: {e}")
             return {}
     
+    def get_paper_text(self, paper_id: int, field: str) -> str:
+        """
+        Fetch a long text field of a paper from the database.
+        
+        Graph nodes only carry structural fields (ids, title, year, citation
+        count); abstracts and extracted contributions are read on demand.
+        
+        Args:
+            paper_id: Database paper ID
+            field: One of abstract, main_problem, key_innovation, limitations, research_gaps
+        
+        Returns:
+            Field text, or an empty string if unavailable
+        """
+        if field not in _PAPER_TEXT_FIELDS:
+            raise ValueError(f"Unknown paper text field: {field}")
+        
+        table, id_column = _PAPER_TEXT_FIELDS[field]
+        try:
+            with db.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f'SELECT {field} FROM {table} WHERE {id_column} = ? ORDER BY id DESC LIMIT 1',
+                    (paper_id,)
+                )
+                row = cursor.fetchone()
+            return (row[field] if row else '') or ''
+        except Exception as e:
+            logger.warning(f"Could not fetch {field} for paper {paper_id}: {e}")
+            return ''
+    
+    def _load_contributions(self) -> Dict[int, Dict]:
+        """Latest extracted contributions per paper ID, in a single query."""
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT paper_id, main_problem, key_innovation, research_gaps
+                FROM paper_contributions ORDER BY id
+            ''')
+            return {row['paper_id']: dict(row) for row in cursor.fetchall()}
+    
     def _extract_concepts(self, paper_data: Dict) -> List[str]:
         """Extract key concepts from paper."""
         concepts = set()
@@ -350,65 +597,495 @@ class KnowledgeGraph:
         if not text:
             return []
         
-        # Common technical terms (simplified - can use NLP libraries)
-        keywords = []
-        terms = text.lower().split()
+        # Unique important terms in order of first appearance
+        return list(dict.fromkeys(
+            term for term in text.lower().split() if term in _IMPORTANT_TERMS
+        ))
+    
+    def _index_paper_title(self, seq: int, title: str):
+        """Register a paper's title words (by sequence number) in the citation matching index."""
+        for token in self._paper_title_tokens.pop(seq, ()):
+            self._token_to_papers[token].discard(seq)
         
-        important_terms = [
-            'neural', 'network', 'learning', 'deep', 'machine', 'model',
-            'algorithm', 'optimization', 'training', 'architecture', 
-            'transformer', 'attention', 'convolution', 'lstm', 'gru'
-        ]
+        tokens = _tokset(title)
+        if tokens:
+            self._paper_title_tokens[seq] = tokens
+            for token in tokens:
+                self._token_to_papers[token].add(seq)
+    
+    def _rebuild_indexes(self):
+        """Rebuild in-memory lookup indexes from the graph."""
+        self._paper_nodes = {}
+        self._paper_order = []
+        self._author_nodes = {}
+        self._concept_nodes = {}
+        self._paper_title_tokens = {}
+        self._token_to_papers = defaultdict(set)
+        
+        partitions = {
+            'author': self._author_nodes,
+            'concept': self._concept_nodes
+        }
+        
+        for node, data in self.graph.nodes(data=True):
+            node_type = data.get('type')
+            if node_type == 'paper':
+                self._paper_nodes[node] = len(self._paper_order)
+                self._paper_order.append(node)
+                self._index_paper_title(self._paper_nodes[node], data.get('title', ''))
+            elif node_type in partitions:
+                partitions[node_type][node] = None
+    
+    def _get_csr(self) -> Dict:
+        """Return the CSR adjacency snapshot, rebuilding it if the graph changed."""
+        if self._csr is None or self._csr_dirty:
+            self._rebuild_csr()
+        return self._csr
+    
+    def _rebuild_csr(self):
+        """
+        Build a read-only CSR (compressed sparse row) view of the graph.
+        
+        Neighbour lists become contiguous int32 slices with a parallel uint8
+        relationship array, for both outgoing and incoming edges. NetworkX
+        remains the source of truth; this is only a query snapshot.
+        """
+        self._csr_dirty = False  # Writes during the rebuild mark it dirty again
+        
+        node_ids = []
+        node_types = []
+        node_jobs = []
+        paper_ids = []
+        for node, data in self.graph.nodes(data=True):
+            node_ids.append(node)
+            node_types.append(_NODE_TYPE_CODES.get(data.get('type'), _NODE_OTHER))
+            job_id = data.get('job_id')
+            node_jobs.append(job_id if isinstance(job_id, int) else -1)
+            paper_id = data.get('paper_id')
+            paper_ids.append(paper_id if isinstance(paper_id, int) else -1)
+        
+        node_index = {node: i for i, node in enumerate(node_ids)}
+        
+        self._csr = {
+            'node_ids': node_ids,
+            'node_index': node_index,
+            'node_types': np.array(node_types, dtype=np.uint8),
+            'node_jobs': np.array(node_jobs, dtype=np.int64),
+            'paper_ids': np.array(paper_ids, dtype=np.int64),
+            'in_degree': np.fromiter(
+                (len(self.graph.pred[node]) for node in node_ids),
+                dtype=np.int32, count=len(node_ids)
+            ),  # Distinct predecessors per node
+            'out': self._build_csr(self.graph.succ, node_ids, node_index),
+            'in': self._build_csr(self.graph.pred, node_ids, node_index),
+            'related_memo': {}  # (paper_id, max_results, job_id) -> related papers
+        }
+    
+    def _save_csr(self) -> str:
+        """
+        Write the CSR snapshot as .npy files so the next load can memory-map it.
+        
+        Returns:
+            Stamp identifying this snapshot, stored in the graph as well
+        """
+        csr = self._get_csr()
+        stamp = uuid.uuid4().hex
+        meta_path = os.path.join(self.csr_dir, 'meta.json')
+        os.makedirs(self.csr_dir, exist_ok=True)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)  # Invalidate the old snapshot while files are replaced
         
-        for term in terms:
-            if term in important_terms and term not in keywords:
-                keywords.append(term)
+        arrays = {name: csr[name] for name in _CSR_NODE_ARRAYS}
+        for direction in _CSR_DIRECTIONS:
+            for part, array in zip(_CSR_PARTS, csr[direction]):
+                arrays[f'{direction}_{part}'] = array
         
-        return keywords
+        for name, array in arrays.items():
+            # Replace rather than overwrite: the old file may still be mapped
+            path = os.path.join(self.csr_dir, f'{name}.npy')
+            with open(path + '.tmp', 'wb') as f:
+                np.save(f, np.asarray(array))
+            os.replace(path + '.tmp', path)
+        
+        with open(meta_path, 'w') as f:
+            json.dump({'stamp': stamp}, f)
+        return stamp
     
-    def _extract_year(self, date_str: str) -> int:
-        """Extract year from date string."""
+    def _load_csr(self) -> bool:
+        """
+        Memory-map the saved CSR snapshot if it matches the loaded graph.
+        
+        Returns:
+            True if the snapshot was loaded, False if it must be rebuilt
+        """
         try:
-            if date_str:
-                return int(date_str[:4])
-        except:
-            pass
-        return 0
-    
-    def _normalize_author_name(self, name: str) -> str:
-        """Normalize author name for matching."""
-        normalized = name.lower().strip()
-        return f"author_{normalized.replace(' ', '_')}"
-    
-    def _title_similarity(self, title1: str, title2: str) -> float:
-        """Simple title similarity (can be improved)."""
-        words1 = set(title1.lower().split())
-        words2 = set(title2.lower().split())
-        
-        if not words1 or not words2:
+            with open(os.path.join(self.csr_dir, 'meta.json')) as f:
+                stamp = json.load(f)['stamp']
+            if stamp != self.graph.graph.get('csr_stamp'):
+                return False
+            
+            def load(name):
+                return np.load(os.path.join(self.csr_dir, f'{name}.npy'), mmap_mode='r')
+            
+            csr = {name: load(name) for name in _CSR_NODE_ARRAYS}
+            for direction in _CSR_DIRECTIONS:
+                csr[direction] = tuple(load(f'{direction}_{part}') for part in _CSR_PARTS)
+            
+            if len(csr['node_types']) != self.graph.number_of_nodes() or \
+                    len(csr['out'][1]) != self.graph.number_of_edges():
+                return False
+            
+            csr['node_ids'] = list(self.graph)
+            csr['node_index'] = {node: i for i, node in enumerate(csr['node_ids'])}
+            csr['related_memo'] = {}
+            self._csr = csr
+            self._csr_dirty = False
+            return True
+        except Exception as e:
+            logger.warning(f"Could not load CSR snapshot, rebuilding: {e}")
+            return False
+    
+    def _build_csr(self, adjacency, node_ids: List[str],
+                   node_index: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Flatten one direction of the adjacency into (indptr, indices, relationships)."""
+        indptr = np.zeros(len(node_ids) + 1, dtype=np.int32)
+        indices = []
+        relationships = []
+        
+        for i, node in enumerate(node_ids):
+            for neighbor, edge_data in adjacency[node].items():
+                indices.append(node_index[neighbor])
+                relationships.append(edge_data.get('rel_mask', 0))
+            indptr[i + 1] = len(indices)
+        
+        return (
+            indptr,
+            np.array(indices, dtype=np.int32),
+            np.array(relationships, dtype=np.uint8)
+        )
+    
+    def _related_sections(self, csr: Dict, source: int, job_id: Optional[int]):
+        """
+        Yield candidate related papers of a source paper, section by section.
+        
+        Sections come in priority order (papers citing it, papers it cites,
+        same-author papers, shared-concept papers) as tuples of
+        (relationship, candidate node positions, concept positions or None).
+        """
+        node_types = csr['node_types']
+        out_ptr, out_idx, out_rel = csr['out']
+        in_ptr, in_idx, in_rel = csr['in']
+        
+        # Neighbour slices of the source paper
+        preds = in_idx[in_ptr[source]:in_ptr[source + 1]]
+        pred_rels = in_rel[in_ptr[source]:in_ptr[source + 1]]
+        succs = out_idx[out_ptr[source]:out_ptr[source + 1]]
+        succ_rels = out_rel[out_ptr[source]:out_ptr[source + 1]]
+        
+        # Papers that cite this paper
+        mask = self._paper_mask(csr, preds, job_id) & ((pred_rels & REL_CITES) != 0)
+        yield 'cites_this', preds[mask], None
+        
+        # Papers cited by this paper
+        mask = self._paper_mask(csr, succs, job_id) & ((succ_rels & REL_CITES) != 0)
+        yield 'cited_by_this', succs[mask], None
+        
+        # Papers by same authors, gathered from all author slices at once
+        authors = self._unique_in_order(preds[node_types[preds] == _NODE_AUTHOR])
+        papers, _ = self._gather_neighbors(out_ptr, out_idx, authors)
+        mask = self._paper_mask(csr, papers, job_id) & (papers != source)
+        yield 'same_author', papers[mask], None
+        
+        # Papers with shared concepts, tagged with the concept they came through
+        concepts = self._unique_in_order(succs[node_types[succs] == _NODE_CONCEPT])
+        papers, owners = self._gather_neighbors(in_ptr, in_idx, concepts)
+        mask = self._paper_mask(csr, papers, job_id) & (papers != source)
+        yield 'shared_concept', papers[mask], owners[mask]
+    
+    @staticmethod
+    def _unique_in_order(positions: np.ndarray) -> np.ndarray:
+        """Drop repeated positions, keeping first occurrences in their original order."""
+        _, first = np.unique(positions, return_index=True)
+        return positions[np.sort(first)]
+    
+    @staticmethod
+    def _gather_neighbors(indptr: np.ndarray, indices: np.ndarray,
+                          nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Concatenate the CSR neighbour slices of several nodes in one gather.
+        
+        Returns:
+            Tuple of (neighbour positions, owning node of each neighbour)
+        """
+        starts = indptr[nodes]
+        lengths = indptr[nodes + 1] - starts
+        offsets = np.cumsum(lengths) - lengths
+        within = np.arange(int(lengths.sum())) - np.repeat(offsets, lengths)
+        return indices[np.repeat(starts, lengths) + within], np.repeat(nodes, lengths)
+    
+    def _paper_mask(self, csr: Dict, positions: np.ndarray, job_id: Optional[int]) -> np.ndarray:
+        """Boolean mask of positions that are paper nodes in the given job."""
+        mask = csr['node_types'][positions] == _NODE_PAPER
+        if job_id is not None:
+            mask &= csr['node_jobs'][positions] == job_id
+        return mask
+    
+    def _title_similarity(self, words1: frozenset, words2: frozenset,
+                          min_similarity: float = 0.0) -> float:
+        """
+        Jaccard similarity of two pre-tokenized titles (see _tokset).
+        
+        Args:
+            words1: Word set of the first title
+            words2: Word set of the second title
+            min_similarity: Pairs that cannot reach this score return 0.0 early
+        
+        Returns:
+            Similarity between 0 and 1
+        """
+        len1 = len(words1)
+        len2 = len(words2)
+        
+        if not len1 or not len2:
             return 0.0
         
-        intersection = words1.intersection(words2)
-        union = words1.union(words2)
+        # Jaccard is at most min/max of the set sizes, so skip lopsided pairs
+        if min(len1, len2) < min_similarity * max(len1, len2):
+            return 0.0
+        
+        # |A & B| / |A | B| without building the union set
+        intersection = len(words1 & words2)
+        
+        return intersection / (len1 + len2 - intersection)
+    
+    def _add_node(self, node: str, **attrs):
+        """Add (or update) a node and queue the write for the WAL."""
+        self.graph.add_node(node, **attrs)
+        self._pending_wal.append({'op': 'node', 'id': node, 'attrs': attrs})
+    
+    def _add_edge(self, source: str, target: str, relationship: str):
+        """Add a relationship to an edge and queue the write for the WAL."""
+        self._merge_edge(self.graph, source, target, relationship)
+        self._pending_wal.append({'op': 'edge', 'u': source, 'v': target, 'rel': relationship})
+    
+    def _merge_edge(self, graph: nx.DiGraph, source: str, target: str, relationship: str):
+        """OR a relationship bit into the (single) edge between two nodes."""
+        bit = _REL_CODES[relationship]
+        if graph.has_edge(source, target):
+            edge_data = graph[source][target]
+            edge_data['rel_mask'] = edge_data.get('rel_mask', 0) | bit
+        else:
+            graph.add_edge(source, target, rel_mask=bit)
+    
+    def _convert_multigraph(self):
+        """Convert graphs saved as a MultiDiGraph, folding parallel edges into bitmasks."""
+        if not self.graph.is_multigraph():
+            return
+        
+        converted = nx.DiGraph()
+        converted.graph.update(self.graph.graph)
+        converted.add_nodes_from(self.graph.nodes(data=True))
+        for source, target, data in self.graph.edges(data=True):
+            if data.get('relationship') in _REL_CODES:
+                self._merge_edge(converted, source, target, data['relationship'])
+        
+        logger.info(f"Converted knowledge graph to DiGraph: {self.graph.number_of_edges()} -> {converted.number_of_edges()} edges")
+        self.graph = converted
+    
+    def _drop_text_attributes(self):
+        """Strip long text fields that older graph files stored on nodes and edges."""
+        for _, data in self.graph.nodes(data=True):
+            for field in _PAPER_TEXT_FIELDS:
+                data.pop(field, None)
+        
+        for _, _, data in self.graph.edges(data=True):
+            data.pop('reference_info', None)
+    
+    def _flush_wal(self):
+        """
+        Append queued graph writes to the write-ahead log.
+        
+        Each ingest step costs one small append instead of re-pickling the
+        whole graph. Once the log passes config.GRAPH_CHECKPOINT_INTERVAL
+        records, a full snapshot is written and the log starts over.
+        """
+        if not self._pending_wal:
+            return
+        
+        records, self._pending_wal = self._pending_wal, []
+        try:
+            os.makedirs(os.path.dirname(self.wal_path), exist_ok=True)
+            with open(self.wal_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(record, default=str) + '\n' for record in records))
+            self._wal_records += len(records)
+        except Exception as e:
+            logger.warning(f"Could not append to graph WAL: {e}")
+            return
+        
+        if self._wal_records >= config.GRAPH_CHECKPOINT_INTERVAL:
+            self.save_graph()
+    
+    def _replay_wal(self) -> int:
+        """Re-apply graph writes logged after the last snapshot."""
+        if not os.path.exists(self.wal_path):
+            return 0
+        
+        replayed = 0
+        with open(self.wal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning("Skipping corrupt graph WAL record")
+                    continue
+                
+                if record['op'] == 'node':
+                    self.graph.add_node(record['id'], **record['attrs'])
+                elif record['op'] == 'edge':
+                    self._merge_edge(self.graph, record['u'], record['v'], record['rel'])
+                replayed += 1
+        
+        self._wal_records = replayed
+        return replayed
+    
+    def _edges_in_insertion_order(self) -> List[Tuple[str, str]]:
+        """
+        Order edges so that re-adding them reproduces every node's successor
+        and predecessor order (which decides the order of query results).
+        
+        An edge is emitted once it heads both its source's successor list and
+        its target's predecessor list; the original insertion order shows
+        such an order always exists.
+        """
+        succ_lists = {node: list(neighbors) for node, neighbors in self.graph.succ.items()}
+        pred_lists = {node: list(neighbors) for node, neighbors in self.graph.pred.items()}
+        succ_next = dict.fromkeys(succ_lists, 0)
+        pred_next = dict.fromkeys(pred_lists, 0)
+        
+        ready = [
+            (node, successors[0]) for node, successors in succ_lists.items()
+            if successors and pred_lists[successors[0]][0] == node
+        ]
+        ordered = []
+        while ready:
+            source, target = ready.pop()
+            ordered.append((source, target))
+            succ_next[source] += 1
+            pred_next[target] += 1
+            
+            if succ_next[source] < len(succ_lists[source]):
+                successor = succ_lists[source][succ_next[source]]
+                if pred_lists[successor][pred_next[successor]] == source:
+                    ready.append((source, successor))
+            if pred_next[target] < len(pred_lists[target]):
+                predecessor = pred_lists[target][pred_next[target]]
+                if succ_lists[predecessor][succ_next[predecessor]] == target:
+                    ready.append((predecessor, target))
         
-        return len(intersection) / len(union)
+        if len(ordered) != self.graph.number_of_edges():
+            return list(self.graph.edges())  # Not expected; keeps successor order only
+        return ordered
+    
+    def _save_columnar(self, path: str):
+        """Write the graph as columnar node and edge arrays with msgpack."""
+        node_ids = list(self.graph)
+        node_index = {node: i for i, node in enumerate(node_ids)}
+        edges = self._edges_in_insertion_order()
+        succ = self.graph.succ
+        
+        data = {
+            'version': 1,
+            'graph': dict(self.graph.graph),
+            'nodes': {
+                'id': node_ids,
+                'attrs': [self.graph.nodes[node] for node in node_ids]
+            },
+            'edges': {
+                'src': [node_index[source] for source, _ in edges],
+                'dst': [node_index[target] for _, target in edges],
+                'rel': [succ[source][target].get('rel_mask', 0) for source, target in edges]
+            }
+        }
+        with open(path, 'wb') as f:
+            f.write(msgpack.packb(data, use_bin_type=True))
+    
+    def _load_columnar(self, path: str) -> nx.DiGraph:
+        """Read a graph written by _save_columnar."""
+        with open(path, 'rb') as f:
+            data = msgpack.unpackb(f.read(), raw=False)
+        
+        graph = nx.DiGraph()
+        graph.graph.update(data['graph'])
+        node_ids = data['nodes']['id']
+        graph.add_nodes_from(zip(node_ids, data['nodes']['attrs']))
+        edges = data['edges']
+        graph.add_edges_from(
+            (node_ids[source], node_ids[target], {'rel_mask': rel_mask})
+            for source, target, rel_mask in zip(edges['src'], edges['dst'], edges['rel'])
+        )
+        return graph
     
     def save_graph(self):
-        """Save graph to disk."""
+        """
+        Checkpoint: save graph to disk and reset the WAL.
+        
+        Uses the columnar msgpack format when msgpack is installed, otherwise
+        a gzip-compressed pickle. The snapshot is written to a temp file and
+        swapped in before the WAL is reset, so a crash mid-write keeps the old
+        snapshot and WAL. Snapshots in the other formats (including the
+        legacy pickle) are removed so a stale one is never loaded.
+        """
         try:
-            os.makedirs(os.path.dirname(self.graph_path), exist_ok=True)
-            with open(self.graph_path, 'wb') as f:
-                pickle.dump(self.graph, f)
-            logger.info(f"Saved knowledge graph to {self.graph_path}")
+            os.makedirs(os.path.dirname(self.compressed_graph_path), exist_ok=True)
+            self.graph.graph['csr_stamp'] = self._save_csr()
+            if msgpack is not None:
+                path = self.msgpack_graph_path
+                self._save_columnar(path + '.tmp')
+            else:
+                path = self.compressed_graph_path
+                with gzip.open(path + '.tmp', 'wb', compresslevel=3) as f:
+                    pickle.dump(self.graph, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(path + '.tmp', path)
+            
+            for stale_path in (self.msgpack_graph_path, self.compressed_graph_path, self.graph_path):
+                if stale_path != path and os.path.exists(stale_path):
+                    os.remove(stale_path)
+            
+            # Everything logged so far is in the snapshot now
+            self._pending_wal = []
+            open(self.wal_path, 'w').close()
+            self._wal_records = 0
+            logger.info(f"Saved knowledge graph to {path}")
         except Exception as e:
             logger.error(f"Error saving graph: {e}")
     
     def load_graph(self):
-        """Load graph from disk."""
+        """Load the graph snapshot from disk (or a legacy pickle) and replay the WAL."""
         try:
-            with open(self.graph_path, 'rb') as f:
-                self.graph = pickle.load(f)
-            logger.info(f"Loaded knowledge graph from {self.graph_path}")
+            if os.path.exists(self.msgpack_graph_path) and msgpack is None:
+                logger.warning(f"msgpack is not installed; cannot read {self.msgpack_graph_path}")
+            
+            if os.path.exists(self.msgpack_graph_path) and msgpack is not None:
+                path = self.msgpack_graph_path
+                self.graph = self._load_columnar(path)
+            elif os.path.exists(self.compressed_graph_path):
+                path = self.compressed_graph_path
+                with gzip.open(path, 'rb') as f:
+                    self.graph = pickle.load(f)
+            elif os.path.exists(self.graph_path):
+                path = self.graph_path
+                with open(path, 'rb') as f:
+                    self.graph = pickle.load(f)
+            else:
+                path = self.wal_path
+            
+            self._convert_multigraph()
+            replayed = self._replay_wal()
+            self._drop_text_attributes()
+            self._rebuild_indexes()
+            if replayed or not self._load_csr():
+                self._rebuild_csr()
+            logger.info(f"Loaded knowledge graph from {path} ({replayed} WAL records replayed)")
         except Exception as e:
             logger.error(f"Error loading graph: {e}")
     
@@ -417,10 +1094,20 @@ class KnowledgeGraph:
         return {
             'total_nodes': self.graph.number_of_nodes(),
             'total_edges': self.graph.number_of_edges(),
-            'paper_nodes': len([n for n in self.graph.nodes() if n.startswith('paper_')]),
-            'author_nodes': len([n for n in self.graph.nodes() if n.startswith('author_')]),
-            'concept_nodes': len([n for n in self.graph.nodes() if n.startswith('concept_')])
+            'paper_nodes': len(self._paper_nodes),
+            'author_nodes': len(self._author_nodes),
+            'concept_nodes': len(self._concept_nodes)
         }
 
-# Global knowledge graph instance
-knowledge_graph = KnowledgeGraph()
\ No newline at end of file
+# Global instance, created on first use so importing this module doesn't load the graph
+_knowledge_graph = None
+_knowledge_graph_lock = threading.Lock()
+
+def get_knowledge_graph() -> KnowledgeGraph:
+    """Return the shared KnowledgeGraph, loading it on first call."""
+    global _knowledge_graph
+    if _knowledge_graph is None:
+        with _knowledge_graph_lock:
+            if _knowledge_graph is None:
+                _knowledge_graph = KnowledgeGraph()
+    return _knowledge_graph
\ No newline at end of file
@@ -0,0 +1,124 @@
+# modules/llm_backend.py - LLM Backend Selection
+import json
+import threading
+from typing import List, Dict, Optional
+import httpx
+import requests
+import ollama
+from config import config
+from modules.utils import logger
+
+class LlamaCppClient:
+    """
+    Client for a llama.cpp server with the same chat/generate interface as ollama.Client.
+    
+    Speculative decoding is configured on the server (llama-server --model-draft),
+    where the draft model proposes tokens that the main model verifies in one
+    forward pass. Responses are converted to ollama's shape, so the RAG engines
+    use either backend unchanged.
+    """
+    
+    def __init__(self, host: str, timeout: Optional[float] = None):
+        self.host = host.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()  # Keeps the connection to the server alive
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=config.LLM_MAX_CONNECTIONS)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+    
+    def chat(self, model: str, messages: List[Dict], stream: bool = False,
+             options: Optional[Dict] = None, **kwargs):
+        """
+        Run a chat completion on the llama.cpp server.
+        
+        Args:
+            model: Model name (the server answers with the model it was started with)
+            messages: Chat messages
+            stream: Yield response chunks as they arrive instead of one response
+            options: ollama-style generation options (temperature, num_predict, top_p)
+            **kwargs: ollama-only arguments such as keep_alive, ignored here
+        
+        Returns:
+            {'message': {'content': str}}, or an iterator of such chunks when streaming
+        """
+        payload = {'model': model, 'messages': messages, 'stream': stream}
+        payload.update(self._sampling_params(options or {}))
+        
+        response = self.session.post(
+            f"{self.host}/v1/chat/completions",
+            json=payload,
+            stream=stream,
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        
+        if stream:
+            return self._stream_chunks(response)
+        
+        content = response.json()['choices'][0]['message'].get('content') or ''
+        return {'message': {'role': 'assistant', 'content': content}}
+    
+    def generate(self, model: str, prompt: str, options: Optional[Dict] = None, **kwargs) -> Dict:
+        """Single-prompt completion, returned in ollama's generate shape."""
+        response = self.chat(model, [{'role': 'user', 'content': prompt}], options=options)
+        return {'response': response['message']['content']}
+    
+    def _stream_chunks(self, response: requests.Response):
+        """Convert the server's SSE stream into ollama-style chunks."""
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    break
+                delta = json.loads(data)['choices'][0].get('delta', {})
+                yield {'message': {'role': 'assistant', 'content': delta.get('content') or ''}}
+    
+    @staticmethod
+    def _sampling_params(options: Dict) -> Dict:
+        """Map ollama generation options to OpenAI-style request fields."""
+        params = {}
+        if 'temperature' in options:
+            params['temperature'] = options['temperature']
+        if 'top_p' in options:
+            params['top_p'] = options['top_p']
+        if 'num_predict' in options:
+            params['max_tokens'] = options['num_predict']
+        return params
+
+def create_llm_client():
+    """
+    Create the client used for answer generation.
+    
+    Returns a llama.cpp client when a draft model is configured (speculative
+    decoding), otherwise an ollama client. Both keep a pool of up to
+    LLM_MAX_CONNECTIONS keep-alive connections, so one client can serve
+    concurrent queries from several threads.
+    """
+    if config.RAG_DRAFT_MODEL:
+        logger.info(f"Using llama.cpp server at {config.LLAMACPP_HOST} "
+                    f"(speculative decoding with draft model {config.RAG_DRAFT_MODEL})")
+        return LlamaCppClient(host=config.LLAMACPP_HOST, timeout=config.OLLAMA_TIMEOUT)
+    
+    return ollama.Client(
+        host=config.OLLAMA_HOST,
+        timeout=config.OLLAMA_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=config.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=config.LLM_MAX_CONNECTIONS
+        )
+    )
+
+# Global client shared by the RAG engines, created on first use
+_llm_client = None
+_llm_client_lock = threading.Lock()
+
+def get_llm_client():
+    """Return the shared LLM client, creating it on first call."""
+    global _llm_client
+    if _llm_client is None:
+        with _llm_client_lock:
+            if _llm_client is None:
+                _llm_client = create_llm_client()
+    return _llm_client
@@ -1,13 +1,187 @@
 # modules/rag_engine.py - ENHANCED RAG Query Engine
-import ollama
 import re
-from typing import List, Dict, Optional
-from collections import defaultdict
+import heapq
+import hashlib
+import functools
+import itertools
+import threading
+from typing import List, Dict, Optional, Iterator, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from config import config
 from modules.utils import logger
 from modules.vector_db import vector_db
-from modules.knowledge_graph import knowledge_graph
+from modules.knowledge_graph import get_knowledge_graph
 from modules.database import db
+from modules.llm_backend import get_llm_client
+
+# Query type patterns, fused into one case-insensitive regex with a
+# named group per type so a question is scanned only once
+_QUERY_PATTERNS = {
+    'comparison': r'\b(?:compare|contrast|difference|versus|vs|across|between)\b',
+    'methodology': r'\b(?:method|approach|technique|algorithm|implementation|how)\b',
+    'gap': r'\b(?:gap|limitation|challenge|problem|issue|future work|missing)\b',
+    'result': r'\b(?:result|finding|outcome|performance|accuracy|metric)\b',
+    'summary': r'\b(?:summarize|overview|main|key|important)\b'
+}
+_QUERY_RX = re.compile(
+    '|'.join(f'(?P<{k}>{v})' for k, v in _QUERY_PATTERNS.items()),
+    re.IGNORECASE
+)
+
+@functools.lru_cache(maxsize=512)
+def _classify_query(question: str) -> Tuple[str, ...]:
+    """Query types matched by a question, in pattern order (cached; UIs resubmit questions)."""
+    matched = {match.lastgroup for match in _QUERY_RX.finditer(question)}
+    return tuple(query_type for query_type in _QUERY_PATTERNS if query_type in matched) or ('general',)
+
+@functools.lru_cache(maxsize=512)
+def _expand_query(question: str, query_types: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Retrieval queries for a question: itself plus type-specific rephrasings (cached)."""
+    expansions = [question]  # Original query
+    
+    # Add type-specific expansions
+    if 'methodology' in query_types:
+        expansions.append(f"describe the approach and techniques used: {question}")
+        expansions.append(f"implementation details and methods: {question}")
+    
+    if 'gap' in query_types:
+        expansions.append(f"limitations and future work: {question}")
+        expansions.append(f"challenges and open problems: {question}")
+    
+    if 'comparison' in query_types:
+        expansions.append(f"similarities and differences: {question}")
+    
+    return tuple(expansions)
+
+# Section name keywords that earn a rerank boost (substrings of the lowercased name)
+_TOP_SECTION_KEYWORDS = ('abstract', 'contribution', 'conclusion')
+_METHOD_SECTION_KEYWORDS = ('method', 'approach', 'implementation')
+
+# Average characters per word (including the separating space), used to turn
+# the word budget for the context into a character budget
+_CHARS_PER_WORD = 6
+_CITATION_RX = re.compile(r'\[(?:Paper|Source)')
+
+@functools.lru_cache(maxsize=1024)
+def _section_boost(section_type: str) -> float:
+    """Rerank multiplier for a section (abstract, contributions > methods > body)."""
+    section = section_type.lower()
+    if any(kw in section for kw in _TOP_SECTION_KEYWORDS):
+        return 1.2
+    if any(kw in section for kw in _METHOD_SECTION_KEYWORDS):
+        return 1.15
+    return 1.0
+
+# Answer prompt templates, filled with str.format_map (values are not re-parsed)
+_COMPARISON_PROMPT = """You are analyzing multiple research papers to answer a comparative question.
+
+PAPERS ANALYZED:
+{papers}
+
+CONTEXT:
+{context}
+
+QUESTION: {question}
+
+INSTRUCTIONS FOR COMPARISON:
+1. Create a structured comparison across ALL papers
+2. Identify similarities and differences explicitly
+3. Use format: "[Paper X] uses approach A, while [Paper Y] uses approach B"
+4. Cite paper numbers: [Paper 1], [Paper 2], etc.
+5. Create a summary table if comparing multiple dimensions
+6. Highlight consensus vs disagreements
+7. Note any papers that stand out
+
+PROVIDE YOUR COMPARATIVE ANALYSIS:"""
+
+_GAP_ANALYSIS_PROMPT = """You are analyzing research papers to identify gaps, limitations, and future directions.
+
+CONTEXT:
+{context}
+
+QUESTION: {question}
+
+INSTRUCTIONS FOR GAP ANALYSIS:
+1. Extract explicitly stated limitations from each paper
+2. Identify implicit gaps by analyzing what's missing
+3. Synthesize common challenges mentioned across papers
+4. List specific future work directions suggested
+5. Identify methodological limitations
+6. Note data/resource constraints mentioned
+7. Cite papers when describing gaps: [Paper X]
+
+FORMAT YOUR ANSWER AS:
+**Stated Limitations:**
+- [list from papers]
+
+**Common Challenges:**
+- [synthesize across papers]
+
+**Future Research Directions:**
+- [compile suggestions]
+
+**Methodological Gaps:**
+- [identify missing approaches]
+
+YOUR GAP ANALYSIS:"""
+
+_METHODOLOGY_PROMPT = """You are explaining research methodologies and approaches from multiple papers.
+
+CONTEXT:
+{context}
+
+QUESTION: {question}
+
+INSTRUCTIONS FOR METHODOLOGY EXPLANATION:
+1. Describe the core approach of each relevant paper
+2. Break down algorithms/techniques step-by-step
+3. Explain key innovations or modifications
+4. Compare implementation details across papers
+5. Note dataset choices and experimental setup
+6. Cite papers for each methodology: [Paper X]
+7. Highlight what makes each approach unique
+
+STRUCTURE:
+- Overview of approaches
+- Detailed methodology breakdown per paper
+- Key differences and innovations
+- Implementation considerations
+
+YOUR METHODOLOGY EXPLANATION:"""
+
+_GENERAL_PROMPT = """You are a research assistant analyzing scientific papers.
+
+CONTEXT:
+{context}
+
+QUESTION: {question}
+
+INSTRUCTIONS:
+1. Answer based ONLY on the provided context
+2. Synthesize information across papers
+3. Cite sources using [Paper X] notation
+4. Be specific and technical
+5. If papers disagree, mention both perspectives
+6. If information is incomplete, say so clearly
+
+YOUR ANSWER:"""
+
+_RESEARCH_SUMMARY_PROMPT = """Analyze this collection of {total_papers} research papers and provide a comprehensive landscape overview.
+
+TOP RESEARCH CONCEPTS:
+{concepts}
+
+PROVIDE A COMPREHENSIVE ANALYSIS:
+
+1. **Main Research Themes** (2-3 dominant themes)
+2. **Common Methodologies** (what approaches are popular?)
+3. **Key Findings & Consensus** (areas of agreement)
+4. **Open Challenges** (what problems remain?)
+5. **Future Directions** (where is field heading?)
+
+Write in clear paragraphs with specific references to the concepts above."""
 
 class EnhancedRAGEngine:
     """
@@ -21,14 +195,21 @@ class EnhancedRAGEngine:
     def __init__(self):
         self.model = config.OLLAMA_MODEL
         
-        # Query type patterns
-        self.query_patterns = {
-            'comparison': r'\b(compare|contrast|difference|versus|vs|across|between)\b',
-            'methodology': r'\b(method|approach|technique|algorithm|implementation|how)\b',
-            'gap': r'\b(gap|limitation|challenge|problem|issue|future work|missing)\b',
-            'result': r'\b(result|finding|outcome|performance|accuracy|metric)\b',
-            'summary': r'\b(summarize|overview|main|key|important)\b'
-        }
+        # Shared pooled client keeps connections to the LLM server alive
+        # between queries and across engines
+        self._llm = get_llm_client()
+        
+        # Exact-match LLM response cache: identical prompts (same question and
+        # retrieved context) reuse the previous generation
+        self._answer_cache: OrderedDict = OrderedDict()
+        self._answer_cache_lock = threading.Lock()
+        
+        # Graph enrichment only feeds the sources list, so it runs in the
+        # background while the answer is generated
+        self.enrichment_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='rag_engine')
+        
+        if config.OLLAMA_WARMUP:
+            self.enrichment_pool.submit(self._warmup_model)
         
         logger.info("Enhanced RAG Engine initialized")
     
@@ -38,15 +219,7 @@ class EnhancedRAGEngine:
         
         Returns list of query types (can be multiple)
         """
-        question_lower = question.lower()
-        types = []
-        
-        for query_type, pattern in self.query_patterns.items():
-            if re.search(pattern, question_lower):
-                types.append(query_type)
-        
-        if not types:
-            types = ['general']
+        types = list(_classify_query(question))
         
         logger.info(f"Query classified as: {types}")
         return types
@@ -55,21 +228,7 @@ class EnhancedRAGEngine:
         """
         Expand query with related terms for better retrieval.
         """
-        expansions = [question]  # Original query
-        
-        # Add type-specific expansions
-        if 'methodology' in query_types:
-            expansions.append(f"describe the approach and techniques used: {question}")
-            expansions.append(f"implementation details and methods: {question}")
-        
-        if 'gap' in query_types:
-            expansions.append(f"limitations and future work: {question}")
-            expansions.append(f"challenges and open problems: {question}")
-        
-        if 'comparison' in query_types:
-            expansions.append(f"similarities and differences: {question}")
-        
-        return expansions
+        return list(_expand_query(question, tuple(query_types)))
     
     def query(self, question: str, job_id: Optional[int] = None, 
              specific_paper_id: Optional[int] = None) -> Dict:
@@ -81,6 +240,25 @@ class EnhancedRAGEngine:
             job_id: Filter by specific job/topic
             specific_paper_id: Filter by specific paper
         """
+        for event in self.query_stream(question, job_id, specific_paper_id):
+            if event['type'] == 'result':
+                return event['data']
+    
+    def query_stream(self, question: str, job_id: Optional[int] = None,
+                     specific_paper_id: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Answer a question using enhanced RAG pipeline, streaming the answer.
+        
+        Args:
+            question: User's question
+            job_id: Filter by specific job/topic
+            specific_paper_id: Filter by specific paper
+        
+        Yields:
+            {'type': 'token', 'content': str} events as the answer is generated,
+            then a final {'type': 'result', 'data': Dict} event with the same
+            data query() returns
+        """
         try:
             logger.info(f"🔍 Enhanced RAG Query: {question}")
             
@@ -90,12 +268,13 @@ class EnhancedRAGEngine:
             # Step 2: Check if data exists
             stats = vector_db.get_statistics()
             if stats.get('total_chunks', 0) == 0:
-                return {
+                yield {'type': 'result', 'data': {
                     'answer': 'No papers have been indexed yet. Please click "Reindex All Papers" first.',
                     'sources': [],
                     'confidence': 'low',
                     'error': 'vector_db_empty'
-                }
+                }}
+                return
             
             # Step 3: Multi-query retrieval
             all_results = []
@@ -106,74 +285,84 @@ class EnhancedRAGEngine:
             else:
                 queries = [question]
             
-            for query in queries:
-                results = vector_db.search(
-                    query=query,
-                    top_k=config.RAG_INITIAL_RETRIEVAL,
-                    filter_paper_id=specific_paper_id
-                )
-                all_results.extend(results)
+            # All expanded queries are embedded and searched in one call
+            for results in vector_db.search_batch(
+                queries,
+                top_k=config.RAG_INITIAL_RETRIEVAL,
+                filter_paper_id=specific_paper_id
+            ):
+                all_results.extend(results or [])
             
             # Step 4: Deduplicate and rerank
             unique_results = self._deduplicate_results(all_results)
             
             if not unique_results:
-                return {
+                yield {'type': 'result', 'data': {
                     'answer': f"No relevant information found for this question. The indexed papers might not cover '{question[:50]}...'",
                     'sources': [],
                     'confidence': 'low'
-                }
+                }}
+                return
             
             logger.info(f"✅ Retrieved {len(unique_results)} unique chunks")
             
-            # Step 5: Rerank by relevance
+            # Step 5: Rerank by relevance (only the top K are kept, so no full sort)
             if config.RAG_ENABLE_RERANKING:
-                reranked = self._rerank_results(unique_results, question)
-                final_results = reranked[:config.RAG_TOP_K_RESULTS]
+                final_results = self._rerank_results(unique_results, question)
             else:
-                final_results = unique_results[:config.RAG_TOP_K_RESULTS]
+                final_results = heapq.nlargest(
+                    config.RAG_TOP_K_RESULTS, unique_results,
+                    key=lambda x: x.get('relevance_score', 0)
+                )
             
-            # Step 6: Enrich with knowledge graph
-            enriched = self._enrich_with_graph(final_results)
+            # Step 6: Enrich with knowledge graph (in the background; the prompt doesn't use it)
+            enrich_future = self.enrichment_pool.submit(self._enrich_with_graph, final_results)
             
             # Step 7: Build specialized context
-            context = self._build_enhanced_context(enriched, query_types)
+            context = self._build_enhanced_context(final_results, query_types)
             
-            # Step 8: Generate answer with specialized prompt
-            answer_data = self._generate_enhanced_answer(
-                question, context, query_types, enriched
-            )
+            # Step 8: Generate answer with specialized prompt, passing tokens through
+            answer_data = None
+            for event in self._stream_enhanced_answer(question, context, query_types, final_results):
+                if event['type'] == 'result':
+                    answer_data = event['data']
+                else:
+                    yield event
             
+            enriched = enrich_future.result()
             answer_data['sources'] = self._format_sources(enriched)
             answer_data['query_types'] = query_types
             
             logger.info(f"✅ Enhanced RAG completed: {answer_data['confidence']} confidence")
-            return answer_data
+            yield {'type': 'result', 'data': answer_data}
             
         except Exception as e:
             logger.error(f"❌ Enhanced RAG error: {e}", exc_info=True)
-            return {
+            yield {'type': 'result', 'data': {
                 'answer': f"Error processing query: {str(e)}",
                 'sources': [],
                 'confidence': 'error',
                 'error': str(e)
-            }
+            }}
     
     def _deduplicate_results(self, results: List[Dict]) -> List[Dict]:
-        """Remove duplicate chunks, keeping highest scoring ones."""
-        seen_ids = set()
-        unique = []
+        """
+        Remove duplicate chunks, keeping highest scoring ones.
         
-        # Sort by relevance first
-        sorted_results = sorted(results, key=lambda x: x.get('relevance_score', 0), reverse=True)
+        Single pass without sorting: kept copies are returned in their input
+        order, and callers pick the top results with a selection that keeps
+        input order among ties, like the stable sort it replaces.
+        """
+        best = {}  # chunk id -> position of its highest scoring copy
         
-        for result in sorted_results:
+        for i, result in enumerate(results):
             chunk_id = result['id']
-            if chunk_id not in seen_ids:
-                seen_ids.add(chunk_id)
-                unique.append(result)
+            kept = best.get(chunk_id)
+            if kept is None or results[kept].get('relevance_score', 0) < result.get('relevance_score', 0):
+                best[chunk_id] = i
         
-        return unique
+        kept_positions = set(best.values())
+        return [result for i, result in enumerate(results) if i in kept_positions]
     
     def _rerank_results(self, results: List[Dict], question: str) -> List[Dict]:
         """
@@ -181,41 +370,52 @@ class EnhancedRAGEngine:
         - Relevance score
         - Section priority (abstract, contributions > body)
         - Chunk position (earlier chunks often more relevant)
+        
+        Returns the top RAG_TOP_K_RESULTS results, best first.
         """
+        if not results:
+            return []
+        
+        # One pass over the chunks, each metadata dict looked up once
+        base_scores, priority_boosts, section_boosts = [], [], []
         for result in results:
-            base_score = result.get('relevance_score', 0)
-            metadata = result.get('metadata', {})
+            md = result['metadata']
+            base_scores.append(result.get('relevance_score', 0))
             
             # Priority boost
-            priority = metadata.get('priority', 'normal')
-            if priority == 'high':
-                base_score *= 1.3
+            priority_boosts.append(1.3 if md.get('priority', 'normal') == 'high' else 1.0)
             
-            # Section type boost
-            section = metadata.get('section_type', '').lower()
-            if any(kw in section for kw in ['abstract', 'contribution', 'conclusion']):
-                base_score *= 1.2
-            elif any(kw in section for kw in ['method', 'approach', 'implementation']):
-                base_score *= 1.15
-            
-            result['reranked_score'] = base_score
+            # Section type boost; names are lowercased at index time (section_type_lc),
+            # and each distinct name is classified once per process
+            section_boosts.append(_section_boost(md.get('section_type_lc') or md.get('section_type', '')))
+        
+        base_scores = np.array(base_scores, dtype=np.float64)
+        scores = base_scores * np.array(priority_boosts) * np.array(section_boosts)
+        for result, score in zip(results, scores.tolist()):
+            result['reranked_score'] = score
         
-        return sorted(results, key=lambda x: x.get('reranked_score', 0), reverse=True)
+        # Best first; ties fall back to the original relevance score, then input order
+        order = np.lexsort((-base_scores, -scores))[:config.RAG_TOP_K_RESULTS]
+        return [results[i] for i in order.tolist()]
     
     def _enrich_with_graph(self, results: List[Dict]) -> List[Dict]:
         """Enrich with knowledge graph relationships."""
+        paper_ids = [result['metadata'].get('paper_id') for result in results]
+        
+        try:
+            # One batched graph lookup; chunks of the same paper share it
+            related_map = get_knowledge_graph().find_related_papers_batch(
+                [pid for pid in paper_ids if pid], max_results=2
+            )
+        except Exception as e:
+            logger.debug(f"Could not get related papers: {e}")
+            related_map = {}
+        
         enriched = []
         
-        for result in results:
-            paper_id = result['metadata'].get('paper_id')
-            
+        for result, paper_id in zip(results, paper_ids):
             if paper_id:
-                try:
-                    related = knowledge_graph.find_related_papers(paper_id, max_results=2)
-                    result['related_papers'] = related
-                except Exception as e:
-                    logger.debug(f"Could not get related papers: {e}")
-                    result['related_papers'] = []
+                result['related_papers'] = related_map.get(paper_id, [])
             
             enriched.append(result)
         
@@ -226,23 +426,49 @@ class EnhancedRAGEngine:
         Build context optimized for query type.
         Groups chunks by paper for better comparison.
         """
-        # Group by paper
-        papers = defaultdict(list)
-        for result in results:
-            paper_id = result['metadata'].get('paper_id')
-            papers[paper_id].append(result)
+        # Order chunks by paper, then by section, each in order of first
+        # appearance (the sort is stable), so groups can be emitted in one pass
+        paper_ranks, section_ranks = {}, {}
+        
+        def group_rank(result):
+            md = result['metadata']
+            paper_id = md.get('paper_id')
+            return (paper_ranks.setdefault(paper_id, len(paper_ranks)),
+                    section_ranks.setdefault((paper_id, md.get('section_type', 'Body')), len(section_ranks)))
+        
+        grouped = sorted(results, key=group_rank)
         
+        # Append fragments against a running character budget and stop once it
+        # is spent; no fragment is ever split into words
         context_parts = []
+        chars_left = config.RAG_MAX_CONTEXT_LENGTH * _CHARS_PER_WORD
         
-        for paper_id, chunks in papers.items():
-            if not chunks:
-                continue
-            
+        for fragment in self._context_fragments(grouped):
+            if len(fragment) > chars_left:
+                context_parts.append(self._truncate_chars(fragment, chars_left))
+                context_parts.append("\n[Context truncated...]")
+                break
+            context_parts.append(fragment)
+            chars_left -= len(fragment)
+        
+        return "".join(context_parts)
+    
+    def _context_fragments(self, results: List[Dict]) -> Iterator[str]:
+        """
+        Yield the context piece by piece: paper headers, section labels and chunk texts.
+        
+        Chunks must arrive grouped by paper, and by section within each paper.
+        
+        Every boundary between fragments falls on whitespace, so cutting the
+        context at a fragment boundary never splits a word.
+        """
+        papers = itertools.groupby(results, key=lambda result: result['metadata'].get('paper_id'))
+        for paper_index, (_, chunks) in enumerate(papers):
             # Get paper info from first chunk
-            first_chunk = chunks[0]
+            first_chunk = next(chunks)
             metadata = first_chunk['metadata']
             
-            paper_section = f"""
+            yield ("\n\n" if paper_index else "") + f"""
 ═══════════════════════════════════════
 PAPER: {metadata.get('title', 'Unknown')}
 ArXiv ID: {metadata.get('arxiv_id', 'Unknown')}
@@ -250,31 +476,31 @@ ArXiv ID: {metadata.get('arxiv_id', 'Unknown')}
 """
             
             # Add chunks grouped by section
-            sections = defaultdict(list)
-            for chunk in chunks:
-                section = chunk['metadata'].get('section_type', 'Body')
-                sections[section].append(chunk['text'])
-            
-            for section, texts in sections.items():
-                paper_section += f"\n[{section}]\n"
-                paper_section += "\n".join(texts)
-                paper_section += "\n"
-            
-            context_parts.append(paper_section)
-        
-        full_context = "\n\n".join(context_parts)
-        
-        # Truncate if needed
-        words = full_context.split()
-        if len(words) > config.RAG_MAX_CONTEXT_LENGTH:
-            full_context = " ".join(words[:config.RAG_MAX_CONTEXT_LENGTH]) + "\n[Context truncated...]"
-        
-        return full_context
+            sections = itertools.groupby(
+                itertools.chain((first_chunk,), chunks),
+                key=lambda chunk: chunk['metadata'].get('section_type', 'Body')
+            )
+            for section, section_chunks in sections:
+                yield f"\n[{section}]\n"
+                for i, chunk in enumerate(section_chunks):
+                    yield "\n" + chunk['text'] if i else chunk['text']
+                yield "\n"
+    
+    @staticmethod
+    def _truncate_chars(text: str, max_chars: int) -> str:
+        """Cut text to at most max_chars characters, at the last space or newline if there is one."""
+        if len(text) <= max_chars:
+            return text
+        cut = max(text.rfind(' ', 0, max_chars + 1), text.rfind('\n', 0, max_chars + 1))
+        return text[:cut] if cut > 0 else text[:max_chars]
     
-    def _generate_enhanced_answer(self, question: str, context: str, 
-                                  query_types: List[str], sources: List[Dict]) -> Dict:
+    def _stream_enhanced_answer(self, question: str, context: str, 
+                                query_types: List[str], sources: List[Dict]) -> Iterator[Dict]:
         """
         Generate answer with specialized prompts based on query type.
+        
+        Yields token events while the answer is generated, then one result
+        event; confidence is computed once the full answer is known.
         """
         
         # Select specialized prompt
@@ -288,20 +514,18 @@ ArXiv ID: {metadata.get('arxiv_id', 'Unknown')}
             prompt = self._general_prompt(question, context)
         
         try:
-            response = ollama.chat(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                options={
-                    "temperature": config.RAG_TEMPERATURE,
-                    "num_predict": 800
-                }
-            )
-            
-            answer = response['message']['content'].strip()
+            pieces = []
+            for piece in self._stream_chat(prompt, {
+                "temperature": config.RAG_TEMPERATURE,
+                "num_predict": 800
+            }):
+                pieces.append(piece)
+                yield {'type': 'token', 'content': piece}
+            answer = ''.join(pieces).strip()
             
             # Determine confidence
-            citation_count = answer.count('[Paper') + answer.count('[Source')
-            papers_cited = len(set(s['metadata'].get('paper_id') for s in sources))
+            citation_count = sum(1 for _ in _CITATION_RX.finditer(answer))  # One scan for both markers
+            papers_cited = len({s['metadata'].get('paper_id') for s in sources})
             
             if citation_count >= 3 and papers_cited >= 2:
                 confidence = 'high'
@@ -310,146 +534,117 @@ ArXiv ID: {metadata.get('arxiv_id', 'Unknown')}
             else:
                 confidence = 'low'
             
-            return {
+            yield {'type': 'result', 'data': {
                 'answer': answer,
                 'confidence': confidence,
                 'model_used': self.model,
                 'papers_analyzed': papers_cited
-            }
+            }}
             
         except Exception as e:
             logger.error(f"Answer generation error: {e}")
-            return {
+            yield {'type': 'result', 'data': {
                 'answer': f"Error generating answer: {str(e)}",
                 'confidence': 'error',
                 'error': str(e)
-            }
+            }}
+    
+    def _warmup_model(self):
+        """Generate a single token so the model is loaded before the first query."""
+        try:
+            self._llm.generate(model=self.model, prompt='.', options={'num_predict': 1},
+                               keep_alive=config.OLLAMA_KEEP_ALIVE)
+            logger.info(f"Ollama model {self.model} warmed up")
+        except Exception as e:
+            logger.warning(f"Ollama warmup failed: {e}")
+    
+    def _chat(self, prompt: str, options: Dict) -> str:
+        """Run a single-prompt ollama chat and return the stripped response text."""
+        return ''.join(self._stream_chat(prompt, options)).strip()
+    
+    def _stream_chat(self, prompt: str, options: Dict) -> Iterator[str]:
+        """
+        Stream a single-prompt ollama chat, serving repeated prompts from memory.
+        
+        Args:
+            prompt: Full user prompt
+            options: ollama generation options
+        
+        Yields:
+            Response text pieces as they arrive (a cached response comes whole)
+        """
+        key_hash = hashlib.blake2b(digest_size=16)
+        key_hash.update(f"{self.model}|{sorted(options.items())}|".encode())
+        key_hash.update(prompt.encode())
+        cache_key = key_hash.digest()
+        
+        if config.ENABLE_CACHING:
+            with self._answer_cache_lock:
+                answer = self._answer_cache.get(cache_key)
+                if answer is not None:
+                    self._answer_cache.move_to_end(cache_key)
+                    logger.info("📦 Using cached LLM response")
+            if answer is not None:
+                yield answer
+                return
+        
+        pieces = []
+        for chunk in self._llm.chat(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+            options=options,
+            keep_alive=config.OLLAMA_KEEP_ALIVE
+        ):
+            piece = chunk['message']['content']
+            if piece:
+                pieces.append(piece)
+                yield piece
+        answer = ''.join(pieces).strip()
+        
+        if config.ENABLE_CACHING:
+            with self._answer_cache_lock:
+                self._answer_cache[cache_key] = answer
+                self._answer_cache.move_to_end(cache_key)
+                while len(self._answer_cache) > config.RAG_ANSWER_CACHE_SIZE:
+                    self._answer_cache.popitem(last=False)
     
     def _comparison_prompt(self, question: str, context: str, sources: List[Dict]) -> str:
         """Specialized prompt for comparative analysis."""
         paper_titles = [s['metadata'].get('title', 'Unknown')[:60] for s in sources[:5]]
+        papers = "\n".join(f'{i+1}. {title}' for i, title in enumerate(set(paper_titles)))
         
-        return f"""You are analyzing multiple research papers to answer a comparative question.
-
-PAPERS ANALYZED:
-{chr(10).join(f'{i+1}. {title}' for i, title in enumerate(set(paper_titles)))}
-
-CONTEXT:
-{context}
-
-QUESTION: {question}
-
-INSTRUCTIONS FOR COMPARISON:
-1. Create a structured comparison across ALL papers
-2. Identify similarities and differences explicitly
-3. Use format: "[Paper X] uses approach A, while [Paper Y] uses approach B"
-4. Cite paper numbers: [Paper 1], [Paper 2], etc.
-5. Create a summary table if comparing multiple dimensions
-6. Highlight consensus vs disagreements
-7. Note any papers that stand out
-
-PROVIDE YOUR COMPARATIVE ANALYSIS:"""
+        return _COMPARISON_PROMPT.format_map({'papers': papers, 'context': context, 'question': question})
     
     def _gap_analysis_prompt(self, question: str, context: str, sources: List[Dict]) -> str:
         """Specialized prompt for research gap analysis."""
-        return f"""You are analyzing research papers to identify gaps, limitations, and future directions.
-
-CONTEXT:
-{context}
-
-QUESTION: {question}
-
-INSTRUCTIONS FOR GAP ANALYSIS:
-1. Extract explicitly stated limitations from each paper
-2. Identify implicit gaps by analyzing what's missing
-3. Synthesize common challenges mentioned across papers
-4. List specific future work directions suggested
-5. Identify methodological limitations
-6. Note data/resource constraints mentioned
-7. Cite papers when describing gaps: [Paper X]
-
-FORMAT YOUR ANSWER AS:
-**Stated Limitations:**
-- [list from papers]
-
-**Common Challenges:**
-- [synthesize across papers]
-
-**Future Research Directions:**
-- [compile suggestions]
-
-**Methodological Gaps:**
-- [identify missing approaches]
-
-YOUR GAP ANALYSIS:"""
+        return _GAP_ANALYSIS_PROMPT.format_map({'context': context, 'question': question})
     
     def _methodology_prompt(self, question: str, context: str, sources: List[Dict]) -> str:
         """Specialized prompt for methodology questions."""
-        return f"""You are explaining research methodologies and approaches from multiple papers.
-
-CONTEXT:
-{context}
-
-QUESTION: {question}
-
-INSTRUCTIONS FOR METHODOLOGY EXPLANATION:
-1. Describe the core approach of each relevant paper
-2. Break down algorithms/techniques step-by-step
-3. Explain key innovations or modifications
-4. Compare implementation details across papers
-5. Note dataset choices and experimental setup
-6. Cite papers for each methodology: [Paper X]
-7. Highlight what makes each approach unique
-
-STRUCTURE:
-- Overview of approaches
-- Detailed methodology breakdown per paper
-- Key differences and innovations
-- Implementation considerations
-
-YOUR METHODOLOGY EXPLANATION:"""
+        return _METHODOLOGY_PROMPT.format_map({'context': context, 'question': question})
     
     def _general_prompt(self, question: str, context: str) -> str:
         """General prompt for other question types."""
-        return f"""You are a research assistant analyzing scientific papers.
-
-CONTEXT:
-{context}
-
-QUESTION: {question}
-
-INSTRUCTIONS:
-1. Answer based ONLY on the provided context
-2. Synthesize information across papers
-3. Cite sources using [Paper X] notation
-4. Be specific and technical
-5. If papers disagree, mention both perspectives
-6. If information is incomplete, say so clearly
-
-YOUR ANSWER:"""
+        return _GENERAL_PROMPT.format_map({'context': context, 'question': question})
     
     def _format_sources(self, results: List[Dict]) -> List[Dict]:
         """Format sources with paper grouping."""
-        # Group by paper
+        # Papers are numbered in order of first appearance (one setdefault per source)
         papers_seen = {}
         sources = []
         
-        for i, result in enumerate(results):
-            metadata = result['metadata']
-            paper_id = metadata.get('paper_id')
-            
-            if paper_id not in papers_seen:
-                papers_seen[paper_id] = len(papers_seen) + 1
-            
-            paper_num = papers_seen[paper_id]
+        for i, result in enumerate(results, 1):
+            md = result['metadata']
+            paper_id = md.get('paper_id')
             
             sources.append({
-                'source_number': i + 1,
-                'paper_number': paper_num,
+                'source_number': i,
+                'paper_number': papers_seen.setdefault(paper_id, len(papers_seen) + 1),
                 'paper_id': paper_id,
-                'title': metadata.get('title', 'Unknown'),
-                'arxiv_id': metadata.get('arxiv_id', 'Unknown'),
-                'section': metadata.get('section_type', 'Unknown'),
+                'title': md.get('title', 'Unknown'),
+                'arxiv_id': md.get('arxiv_id', 'Unknown'),
+                'section': md.get('section_type', 'Unknown'),
                 'relevance_score': result.get('relevance_score', 0),
                 'related_papers': result.get('related_papers', [])
             })
@@ -460,7 +655,7 @@ YOUR ANSWER:"""
         """Generate comprehensive research summary."""
         try:
             # Get overview from knowledge graph
-            overview = knowledge_graph.get_research_overview()
+            overview = get_knowledge_graph().get_research_overview()
             
             total_papers = overview.get('total_papers', 0)
             if total_papers == 0:
@@ -478,29 +673,15 @@ YOUR ANSWER:"""
             # Build comprehensive prompt
             top_concepts = overview.get('top_concepts', [])[:10]
             
-            prompt = f"""Analyze this collection of {total_papers} research papers and provide a comprehensive landscape overview.
-
-TOP RESEARCH CONCEPTS:
-{chr(10).join(f'- {name} (mentioned {count} times)' for name, count in top_concepts)}
-
-PROVIDE A COMPREHENSIVE ANALYSIS:
-
-1. **Main Research Themes** (2-3 dominant themes)
-2. **Common Methodologies** (what approaches are popular?)
-3. **Key Findings & Consensus** (areas of agreement)
-4. **Open Challenges** (what problems remain?)
-5. **Future Directions** (where is field heading?)
-
-Write in clear paragraphs with specific references to the concepts above."""
-
-            response = ollama.chat(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                options={"temperature": 0.3, "num_predict": 1000}
-            )
+            prompt = _RESEARCH_SUMMARY_PROMPT.format_map({
+                'total_papers': total_papers,
+                'concepts': "\n".join(f'- {name} (mentioned {count} times)' for name, count in top_concepts)
+            })
+            
+            summary = self._chat(prompt, {"temperature": 0.3, "num_predict": 1000})
             
             return {
-                'summary': response['message']['content'].strip(),
+                'summary': summary,
                 'statistics': overview,
                 'total_papers': total_papers
             }
@@ -513,5 +694,15 @@ Write in clear paragraphs with specific references to the concepts above."""
                 'error': str(e)
             }
 
-# Global instance
-rag_engine = EnhancedRAGEngine()
\ No newline at end of file
+# Global instance, created on first use so importing this module doesn't start the LLM warmup
+_rag_engine = None
+_rag_engine_lock = threading.Lock()
+
+def get_rag_engine() -> EnhancedRAGEngine:
+    """Return the shared EnhancedRAGEngine, initializing it on first call."""
+    global _rag_engine
+    if _rag_engine is None:
+        with _rag_engine_lock:
+            if _rag_engine is None:
+                _rag_engine = EnhancedRAGEngine()
+    return _rag_engine
\ No newline at end of file
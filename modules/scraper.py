@@ -1,17 +1,98 @@
 # modules/scraper.py - IMPROVED ArXiv Scraper
 import requests
 import os
+import re
+import shutil
+import hashlib
+import json
+import logging
 import time
+import threading
 import xml.etree.ElementTree as ET
-from urllib.parse import quote_plus
+from urllib.parse import quote, urlencode, urlsplit
 import feedparser
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple, Iterator, Iterable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib3.util.retry import Retry
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
 from config import config
 from modules.utils import (
     logger, get_organized_pdf_path, is_valid_arxiv_id, 
-    is_valid_pdf, format_file_size, ProgressTracker
+    is_valid_pdf, format_file_size, ProgressTracker, RateLimiter,
+    get_cache_path, prune_cache
 )
 
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+_ATOM_NS = {'atom': 'http://www.w3.org/2005/Atom',
+            'arxiv': 'http://arxiv.org/schemas/atom'}
+_ATOM_ENTRY_TAG = '{http://www.w3.org/2005/Atom}entry'
+
+def _compile_path(path: str):
+    """Compile an element path over the Atom namespaces (lxml XPath when available)."""
+    if lxml_etree is not None:
+        return lxml_etree.XPath(path, namespaces=_ATOM_NS)
+    return lambda elem: elem.findall(path, _ATOM_NS)
+
+_ENTRY_TITLE = _compile_path('atom:title')
+_ENTRY_AUTHOR_NAMES = _compile_path('atom:author/atom:name')
+_ENTRY_SUMMARY = _compile_path('atom:summary')
+_ENTRY_ID = _compile_path('atom:id')
+_ENTRY_CATEGORIES = _compile_path('atom:category')
+_ENTRY_PDF_LINKS = _compile_path("atom:link[@type='application/pdf']")
+
+_WS_RE = re.compile(r'\s+')
+
+def _normalize_ws(text: Optional[str]) -> str:
+    """Collapse runs of whitespace (including newlines and tabs) to single spaces."""
+    return _WS_RE.sub(' ', text).strip() if text else ''
+
+_VERSION_SUFFIX_RE = re.compile(r'v\d+$')
+_TITLE_PUNCT_RE = re.compile(r'[^\w\s]')
+
+_PROGRESS_BATCH = 5  # Papers per progress update while downloading
+
+_S2_CITATION_FIELDS = 'citationCount,influentialCitationCount,year'
+_S2_BATCH_SIZE = 500  # Most IDs Semantic Scholar accepts per batch request
+
+class _ThrottledRetry(Retry):
+    """Retry policy whose retries also wait for the host's rate limiter."""
+    
+    throttle = None  # Callable taking a hostname; blocks until a request may start
+    _host = None
+    
+    def new(self, **kw):
+        retry = super().new(**kw)
+        retry.throttle = self.throttle
+        retry._host = self._host
+        return retry
+    
+    def increment(self, method=None, url=None, response=None, error=None,
+                  _pool=None, _stacktrace=None):
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        if _pool is not None:
+            retry._host = _pool.host
+        return retry
+    
+    def sleep(self, response=None):
+        super().sleep(response)  # Backoff or Retry-After first, then the shared budget
+        if self.throttle is not None and self._host:
+            self.throttle(self._host)
+
+class _ThrottledAdapter(requests.adapters.HTTPAdapter):
+    """HTTPAdapter that waits for the host's rate limiter before every request."""
+    
+    def __init__(self, throttle, **kwargs):
+        self.throttle = throttle
+        super().__init__(**kwargs)
+    
+    def send(self, request, **kwargs):
+        self.throttle(urlsplit(request.url).hostname)
+        return super().send(request, **kwargs)
+
 class ArxivScraper:
     """
     Enhanced ArXiv scraper with:
@@ -34,6 +115,47 @@ class ArxivScraper:
             'User-Agent': 'AI Research Assistant/2.0 (Educational Project)',
             'Accept': 'application/atom+xml'
         })
+        # One token bucket per host: every request on this session (feed fetches,
+        # HEAD checks, downloads, redirects and retries) starts at least
+        # ARXIV_RATE_LIMIT_DELAY seconds after the previous one to that host.
+        # Concurrent workers still overlap the transfers themselves.
+        self._rate_limiters: Dict[str, RateLimiter] = {}
+        self._rate_limiters_lock = threading.Lock()
+        
+        # Keep one pooled connection per download worker (requests defaults to 10)
+        # so concurrent downloads reuse TLS connections instead of discarding them.
+        # The adapter also retries failed connections and throttled or 5xx
+        # responses with exponential backoff, honouring Retry-After.
+        retry = _ThrottledRetry(
+            total=config.PDF_MAX_RETRIES,
+            backoff_factor=1.0,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset({'GET', 'HEAD'})
+        )
+        retry.throttle = self._wait_for_rate_limit
+        adapter = _ThrottledAdapter(
+            self._wait_for_rate_limit,
+            pool_maxsize=max(config.PDF_DOWNLOAD_WORKERS, requests.adapters.DEFAULT_POOLSIZE),
+            max_retries=retry
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+        # Separate keep-alive pool for Semantic Scholar; its adapter retries throttled
+        # and failed lookups with exponential backoff (honouring Retry-After)
+        self.s2_session = requests.Session()
+        s2_retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset({'GET', 'POST'}),  # Batch lookups are read-only POSTs
+            raise_on_status=False
+        )
+        self.s2_session.mount('https://', requests.adapters.HTTPAdapter(
+            pool_connections=4, pool_maxsize=16, max_retries=s2_retry
+        ))
+        rate = config.SEMANTIC_SCHOLAR_RATE_LIMIT
+        self._s2_rate_limiter = RateLimiter(1.0 / rate if rate > 0 else 0)
         
         logger.info("ArxivScraper initialized")
     
@@ -46,7 +168,7 @@ class ArxivScraper:
             filters: Optional filters (author, category, year, etc.)
         
         Returns:
-            URL-encoded query string
+            Query string (URL encoding happens once, in _search_url)
         
         Examples:
             - Simple: "machine learning"
@@ -70,8 +192,31 @@ class ArxivScraper:
             if filters.get('title_keywords'):
                 search_parts.append(f'ti:{filters["title_keywords"]}')
         
-        combined_query = ' AND '.join(search_parts)
-        return quote_plus(combined_query)
+        return ' AND '.join(search_parts)
+    
+    def _search_url(self, query: str, max_results: int, filters: Optional[Dict] = None) -> str:
+        """
+        Build the arXiv API URL for a search.
+        
+        The parameters are encoded in a single pass that leaves the ':' and
+        '[...]' of field prefixes and date ranges readable, as the API expects.
+        
+        Args:
+            query: Base search query
+            max_results: Maximum number of papers
+            filters: Optional search filters
+        
+        Returns:
+            Full query URL
+        """
+        params = {
+            'search_query': self.build_query(query, filters),
+            'start': 0,
+            'max_results': max_results,
+            'sortBy': 'relevance',
+            'sortOrder': 'descending'
+        }
+        return f"{self.base_url}?{urlencode(params, safe=':[]', quote_via=quote)}"
     
     def search_and_download(self, query: str, max_results: int = 5, 
                           filters: Optional[Dict] = None, 
@@ -94,19 +239,27 @@ class ArxivScraper:
             logger.info(f"   Filters: {filters}")
         
         try:
+            # Fetch the response once; both parsers read the same copy
+            try:
+                feed_path = self._fetch_feed(self._search_url(query, max_results, filters))
+            except Exception as e:
+                logger.warning(f"📡 arXiv request failed, each method will retry: {e}")
+                feed_path = None
+            
             # Try feedparser method first
-            papers_metadata = self.search_with_feedparser(query, max_results, filters)
+            papers_metadata = self.search_with_feedparser(query, max_results, filters, feed_path)
             
             if not papers_metadata:
                 logger.warning("📡 Feedparser failed, trying alternative method...")
-                papers_metadata = self.search_with_requests(query, max_results, filters)
+                papers_metadata = self.search_with_requests(query, max_results, filters, feed_path)
             
             if not papers_metadata:
                 logger.error("❌ No papers found with either method")
+                if feed_path:
+                    self._discard_feed(feed_path)
                 return []
             
-            # Deduplicate
-            papers_metadata = self.deduplicate_papers(papers_metadata)
+            # Both methods already dropped duplicates before downloading them
             
             # Enrich with citation data
             if fetch_citations and config.ENABLE_CITATION_FETCH:
@@ -120,70 +273,53 @@ class ArxivScraper:
             return []
     
     def search_with_feedparser(self, query: str, max_results: int, 
-                              filters: Optional[Dict] = None) -> List[Dict]:
-        """Search using feedparser (more reliable)."""
+                              filters: Optional[Dict] = None,
+                              feed_path: Optional[str] = None) -> List[Dict]:
+        """Search using feedparser (more reliable); feed_path reuses an already fetched response."""
         try:
-            search_query = self.build_query(query, filters)
-            url = (f"{self.base_url}?search_query={search_query}&start=0"
-                   f"&max_results={max_results}&sortBy=relevance&sortOrder=descending")
-            
-            logger.debug(f"📡 Fetching from: {url}")
+            prefetched = feed_path is not None
+            if not prefetched:
+                url = self._search_url(query, max_results, filters)
+                logger.debug(f"📡 Fetching from: {url}")
+                feed_path = self._fetch_feed(url)
             
-            feed = feedparser.parse(url)
+            feed = feedparser.parse(feed_path)
             
             if not hasattr(feed, 'entries') or not feed.entries:
                 logger.warning("No entries found in feed")
+                if not prefetched:
+                    self._discard_feed(feed_path)
                 return []
             
-            papers_metadata = []
-            progress = ProgressTracker(len(feed.entries[:max_results]), "Downloading papers")
+            # Downloads start as soon as each entry is parsed; results arrive as they finish
+            downloads = (
+                (metadata, get_organized_pdf_path(query, metadata['arxiv_id']))
+                for metadata in self._unique_papers(self._feed_entries(feed, max_results))
+            )
+            progress = ProgressTracker(min(len(feed.entries), max_results), "Downloading papers")
+            pending_progress = 0
+            completed = {}
+            info_enabled = logger.isEnabledFor(logging.INFO)
             
-            for i, entry in enumerate(feed.entries[:max_results]):
-                logger.info(f"📄 Processing paper {i+1}/{min(len(feed.entries), max_results)}: {entry.title[:60]}...")
-                
-                # Extract metadata
-                metadata = {
-                    'title': entry.title.replace('\n', ' ').strip(),
-                    'authors': [author.name for author in getattr(entry, 'authors', [])],
-                    'abstract': getattr(entry, 'summary', '').replace('\n', ' ').strip(),
-                    'published': getattr(entry, 'published', ''),
-                    'arxiv_id': entry.id.split('/')[-1] if hasattr(entry, 'id') else f'unknown_{i}',
-                    'categories': [tag.term for tag in getattr(entry, 'tags', [])],
-                    'pdf_url': None,
-                    'source': 'arxiv'
-                }
-                
-                # Validate arXiv ID
-                if not is_valid_arxiv_id(metadata['arxiv_id']):
-                    logger.warning(f"⚠️  Invalid arXiv ID: {metadata['arxiv_id']}")
-                
-                # Find PDF link
-                for link in getattr(entry, 'links', []):
-                    if link.type == 'application/pdf':
-                        metadata['pdf_url'] = link.href
-                        break
-                
-                # Fallback PDF URL
-                if not metadata['pdf_url']:
-                    paper_id = entry.id.split('/')[-1]
-                    metadata['pdf_url'] = f"https://arxiv.org/pdf/{paper_id}.pdf"
-                
-                # Download PDF with organized storage
-                if metadata['pdf_url']:
-                    pdf_path = get_organized_pdf_path(query, metadata['arxiv_id'])
-                    
-                    if self.download_pdf(metadata['pdf_url'], pdf_path):
-                        metadata['pdf_file'] = pdf_path
-                        metadata['pdf_filename'] = os.path.basename(pdf_path)
-                        metadata['pdf_size'] = format_file_size(os.path.getsize(pdf_path))
-                        papers_metadata.append(metadata)
-                        logger.info(f"✅ Downloaded: {os.path.basename(pdf_path)} ({metadata['pdf_size']})")
-                    else:
-                        logger.error(f"❌ Failed to download: {metadata['title'][:50]}...")
+            for index, metadata, pdf_path, downloaded in self._download_pdfs(downloads):
+                if downloaded:
+                    metadata['pdf_file'] = pdf_path
+                    metadata['pdf_filename'] = os.path.basename(pdf_path)
+                    metadata['pdf_size'] = format_file_size(os.path.getsize(pdf_path))
+                    completed[index] = metadata
+                    if info_enabled:
+                        logger.info(f"✅ Downloaded: {metadata['pdf_filename']} ({metadata['pdf_size']})")
+                else:
+                    logger.error(f"❌ Failed to download: {metadata['title'][:50]}...")
                 
-                progress.update()
-                time.sleep(config.ARXIV_RATE_LIMIT_DELAY)
+                pending_progress += 1
+                if pending_progress == _PROGRESS_BATCH:
+                    progress.update(pending_progress)
+                    pending_progress = 0
             
+            if pending_progress:
+                progress.update(pending_progress)
+            papers_metadata = [completed[index] for index in sorted(completed)]  # Feed order
             progress.complete()
             return papers_metadata
             
@@ -192,172 +328,411 @@ class ArxivScraper:
             return []
     
     def search_with_requests(self, query: str, max_results: int, 
-                            filters: Optional[Dict] = None) -> List[Dict]:
-        """Fallback: Direct XML parsing."""
+                            filters: Optional[Dict] = None,
+                            feed_path: Optional[str] = None) -> List[Dict]:
+        """Fallback: Direct XML parsing; feed_path reuses an already fetched response."""
         try:
-            search_query = self.build_query(query, filters)
-            url = (f"{self.base_url}?search_query={search_query}&start=0"
-                   f"&max_results={max_results}&sortBy=relevance&sortOrder=descending")
-            
-            logger.debug(f"📡 Direct request to: {url}")
+            prefetched = feed_path is not None
+            if not prefetched:
+                url = self._search_url(query, max_results, filters)
+                logger.debug(f"📡 Direct request to: {url}")
+                feed_path = self._fetch_feed(url)
             
-            response = self.session.get(url, timeout=30, allow_redirects=True)
-            response.raise_for_status()
+            completed = {}
+            entry_count = 0
+            info_enabled = logger.isEnabledFor(logging.INFO)
             
-            root = ET.fromstring(response.content)
-            ns = {'atom': 'http://www.w3.org/2005/Atom', 
-                  'arxiv': 'http://arxiv.org/schemas/atom'}
-            
-            entries = root.findall('atom:entry', ns)
+            # Parse incrementally from disk (the DOM is never held in memory); each
+            # entry's download starts as soon as it is parsed
+            with open(feed_path, 'rb') as source:
+                downloads = (
+                    (metadata, get_organized_pdf_path(query, metadata['arxiv_id']))
+                    for metadata in self._unique_papers(self._iter_entries(source, max_results))
+                )
+                for index, metadata, pdf_path, downloaded in self._download_pdfs(downloads):
+                    entry_count += 1
+                    if downloaded:
+                        metadata['pdf_file'] = pdf_path
+                        metadata['pdf_filename'] = os.path.basename(pdf_path)
+                        completed[index] = metadata
+                        if info_enabled:
+                            logger.info(f"✅ Downloaded: {metadata['pdf_filename']}")
             
-            if not entries:
+            if not entry_count:
                 logger.warning("No entries found in XML response")
+                if not prefetched:
+                    self._discard_feed(feed_path)
                 return []
             
-            papers_metadata = []
-            
-            for i, entry in enumerate(entries[:max_results]):
-                try:
-                    title_elem = entry.find('atom:title', ns)
-                    title = title_elem.text.replace('\n', ' ').strip() if title_elem is not None else f"Unknown Title {i}"
-                    
-                    logger.info(f"📄 Processing paper {i+1}: {title[:50]}...")
-                    
-                    metadata = {
-                        'title': title,
-                        'authors': [],
-                        'abstract': '',
-                        'published': '',
-                        'arxiv_id': f'paper_{i}',
-                        'categories': [],
-                        'pdf_url': None,
-                        'source': 'arxiv'
-                    }
-                    
-                    # Extract authors
-                    authors = entry.findall('atom:author', ns)
-                    for author in authors:
-                        name_elem = author.find('atom:name', ns)
-                        if name_elem is not None:
-                            metadata['authors'].append(name_elem.text.strip())
-                    
-                    # Extract abstract
-                    summary_elem = entry.find('atom:summary', ns)
-                    if summary_elem is not None:
-                        metadata['abstract'] = summary_elem.text.replace('\n', ' ').strip()
-                    
-                    # Extract arXiv ID
-                    id_elem = entry.find('atom:id', ns)
-                    if id_elem is not None:
-                        metadata['arxiv_id'] = id_elem.text.split('/')[-1]
-                    
-                    # Extract categories
-                    categories = entry.findall('atom:category', ns)
-                    for cat in categories:
-                        term = cat.get('term')
-                        if term:
-                            metadata['categories'].append(term)
-                    
-                    # Find PDF link
-                    links = entry.findall('atom:link', ns)
-                    for link in links:
-                        if link.get('type') == 'application/pdf':
-                            metadata['pdf_url'] = link.get('href')
-                            break
-                    
-                    if not metadata['pdf_url']:
-                        metadata['pdf_url'] = f"https://arxiv.org/pdf/{metadata['arxiv_id']}.pdf"
-                    
-                    # Download PDF
-                    pdf_path = get_organized_pdf_path(query, metadata['arxiv_id'])
-                    
-                    if self.download_pdf(metadata['pdf_url'], pdf_path):
-                        metadata['pdf_file'] = pdf_path
-                        metadata['pdf_filename'] = os.path.basename(pdf_path)
-                        papers_metadata.append(metadata)
-                        logger.info(f"✅ Downloaded: {os.path.basename(pdf_path)}")
-                    
-                    time.sleep(config.ARXIV_RATE_LIMIT_DELAY)
-                    
-                except Exception as e:
-                    logger.error(f"❌ Error processing entry {i}: {e}")
-                    continue
-            
-            return papers_metadata
+            return [completed[index] for index in sorted(completed)]  # Feed order
             
         except Exception as e:
             logger.error(f"❌ Direct requests method failed: {e}", exc_info=True)
             return []
     
-    def download_pdf(self, url: str, filepath: str, max_retries: int = None) -> bool:
-        """Download PDF with retry logic and validation."""
-        max_retries = max_retries or config.PDF_MAX_RETRIES
+    def _fetch_feed(self, url: str) -> str:
+        """
+        Fetch an arXiv API response to disk, reusing a recent copy of the same query.
+        
+        The response is streamed through the pooled session (which requests
+        gzip) into the cache, so repeated searches and the fallback parser read
+        it from disk instead of the network.
+        
+        Args:
+            url: arXiv API query URL
+        
+        Returns:
+            Path to the feed XML
+        """
+        cache_key = hashlib.sha1(url.encode()).hexdigest()
+        feed_path = os.path.splitext(get_cache_path(cache_key, 'arxiv_feeds'))[0] + '.xml'
+        
+        try:
+            if time.time() - os.path.getmtime(feed_path) < config.ARXIV_FEED_CACHE_TTL:
+                logger.info("📦 Using cached arXiv response")
+                return feed_path
+        except OSError:
+            pass  # Not cached yet
+        
+        # Write under a per-thread name, then swap in atomically
+        tmp_path = f"{feed_path}.{threading.get_ident()}.tmp"
+        try:
+            with self.session.get(url, timeout=30, allow_redirects=True, stream=True) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                with open(tmp_path, 'wb') as f:
+                    shutil.copyfileobj(response.raw, f, length=config.PDF_DOWNLOAD_CHUNK_SIZE)
+            os.replace(tmp_path, feed_path)
+        except Exception:
+            # Don't leave a partial feed behind to count against the cache size
+            self._remove_partial(tmp_path)
+            raise
+        
+        prune_cache('arxiv_feeds', config.ARXIV_FEED_CACHE_SIZE)
+        return feed_path
+    
+    @staticmethod
+    def _discard_feed(feed_path: str):
+        """Drop a cached response that had no entries, so the next search refetches it."""
+        try:
+            os.remove(feed_path)
+        except OSError:
+            pass
+    
+    def _feed_entries(self, feed, max_results: int) -> Iterator[Dict]:
+        """
+        Convert parsed feedparser entries into paper metadata.
+        
+        Args:
+            feed: feedparser result
+            max_results: Maximum number of entries to read
+        
+        Yields:
+            Paper metadata dictionaries
+        """
+        total = min(len(feed.entries), max_results)
+        info_enabled = logger.isEnabledFor(logging.INFO)
+        
+        for i, entry in enumerate(feed.entries[:max_results]):
+            if info_enabled:
+                logger.info(f"📄 Processing paper {i+1}/{total}: {entry.title[:60]}...")
+            
+            # Extract metadata
+            metadata = {
+                'title': _normalize_ws(entry.title),
+                'authors': [author.name for author in getattr(entry, 'authors', [])],
+                'abstract': _normalize_ws(getattr(entry, 'summary', '')),
+                'published': getattr(entry, 'published', ''),
+                'arxiv_id': entry.id.split('/')[-1] if hasattr(entry, 'id') else f'unknown_{i}',
+                'categories': [tag.term for tag in getattr(entry, 'tags', [])],
+                'pdf_url': None,
+                'source': 'arxiv'
+            }
+            
+            # Validate arXiv ID
+            if not is_valid_arxiv_id(metadata['arxiv_id']):
+                logger.warning(f"⚠️  Invalid arXiv ID: {metadata['arxiv_id']}")
+            
+            # Find PDF link
+            for link in getattr(entry, 'links', []):
+                if link.type == 'application/pdf':
+                    metadata['pdf_url'] = link.href
+                    break
+            
+            # Fallback PDF URL
+            if not metadata['pdf_url']:
+                paper_id = entry.id.split('/')[-1]
+                metadata['pdf_url'] = f"https://arxiv.org/pdf/{paper_id}.pdf"
+            
+            yield metadata
+    
+    def _iter_entries(self, source, max_results: int) -> Iterator[Dict]:
+        """
+        Incrementally parse an arXiv Atom feed into paper metadata.
         
+        Each entry is cleared once processed (and, with lxml, detached from the
+        feed root along with the entries before it), so memory stays flat
+        however large the feed is.
+        
+        Args:
+            source: Binary file-like object with the feed XML
+            max_results: Maximum number of entries to read
+        
+        Yields:
+            Paper metadata dictionaries (entries that fail to parse are skipped)
+        """
+        entry_count = 0
+        info_enabled = logger.isEnabledFor(logging.INFO)
+        if lxml_etree is not None:
+            # libxml2 filters by tag, so only entry elements reach Python
+            events = lxml_etree.iterparse(source, events=('end',), tag=_ATOM_ENTRY_TAG)
+        else:
+            events = ET.iterparse(source, events=('end',))
+        
+        for _, entry in events:
+            if entry.tag != _ATOM_ENTRY_TAG:
+                continue
+            if entry_count >= max_results:
+                break
+            
+            i = entry_count
+            entry_count += 1
+            try:
+                title_elems = _ENTRY_TITLE(entry)
+                title = _normalize_ws(title_elems[0].text) if title_elems else f"Unknown Title {i}"
+                
+                if info_enabled:
+                    logger.info(f"📄 Processing paper {i+1}: {title[:50]}...")
+                
+                metadata = {
+                    'title': title,
+                    'authors': [],
+                    'abstract': '',
+                    'published': '',
+                    'arxiv_id': f'paper_{i}',
+                    'categories': [],
+                    'pdf_url': None,
+                    'source': 'arxiv'
+                }
+                
+                # Extract authors
+                for name_elem in _ENTRY_AUTHOR_NAMES(entry):
+                    metadata['authors'].append(_normalize_ws(name_elem.text))
+                
+                # Extract abstract
+                summary_elems = _ENTRY_SUMMARY(entry)
+                if summary_elems:
+                    metadata['abstract'] = _normalize_ws(summary_elems[0].text)
+                
+                # Extract arXiv ID
+                id_elems = _ENTRY_ID(entry)
+                if id_elems:
+                    metadata['arxiv_id'] = id_elems[0].text.split('/')[-1]
+                
+                # Extract categories
+                for cat in _ENTRY_CATEGORIES(entry):
+                    term = cat.get('term')
+                    if term:
+                        metadata['categories'].append(term)
+                
+                # Find PDF link
+                pdf_links = _ENTRY_PDF_LINKS(entry)
+                if pdf_links:
+                    metadata['pdf_url'] = pdf_links[0].get('href')
+                
+                if not metadata['pdf_url']:
+                    metadata['pdf_url'] = f"https://arxiv.org/pdf/{metadata['arxiv_id']}.pdf"
+            
+            except Exception as e:
+                logger.error(f"❌ Error processing entry {i}: {e}")
+                continue
+            finally:
+                entry.clear()
+                if lxml_etree is not None:
+                    while entry.getprevious() is not None:
+                        del entry.getparent()[0]
+            
+            yield metadata
+    
+    def _download_pdfs(self, downloads: Iterable[Tuple[Dict, str]]) -> Iterator[Tuple[int, Dict, str, bool]]:
+        """
+        Download PDFs concurrently while the caller's entries are still being produced.
+        
+        Each (metadata, pdf_path) pair is handed to a download worker as soon as
+        it is drawn from downloads, so parsing overlaps the first downloads.
+        
+        Args:
+            downloads: (metadata, pdf_path) pairs, typically a generator over feed entries
+        
+        Yields:
+            (index, metadata, pdf_path, success) for each download as it finishes;
+            index is the pair's position in downloads
+        """
+        with ThreadPoolExecutor(max_workers=max(1, config.PDF_DOWNLOAD_WORKERS),
+                                thread_name_prefix='arxiv_download') as pool:
+            futures = {
+                pool.submit(self.download_pdf, metadata['pdf_url'], pdf_path): (index, metadata, pdf_path)
+                for index, (metadata, pdf_path) in enumerate(downloads)
+            }
+            for future in as_completed(futures):
+                yield (*futures[future], future.result())
+    
+    def _wait_for_rate_limit(self, host: str):
+        """Block until this thread may start a request to the host."""
+        limiter = self._rate_limiters.get(host)
+        if limiter is None:
+            with self._rate_limiters_lock:
+                limiter = self._rate_limiters.get(host)
+                if limiter is None:
+                    limiter = RateLimiter(config.ARXIV_RATE_LIMIT_DELAY)
+                    self._rate_limiters[host] = limiter
+        
+        limiter.acquire()
+    
+    def download_pdf(self, url: str, filepath: str) -> bool:
+        """
+        Download PDF with validation.
+        
+        The session retries connecting and error statuses; a body transfer that
+        times out or drops part-way is retried here, up to PDF_MAX_RETRIES times.
+        """
         # Skip if file already exists and is valid
-        if os.path.exists(filepath) and is_valid_pdf(filepath):
+        if is_valid_pdf(filepath):
             logger.info(f"📦 PDF already exists: {os.path.basename(filepath)}")
             return True
         
-        for attempt in range(max_retries):
+        if config.PDF_PREFLIGHT_HEAD and not self._preflight_pdf(url):
+            return False
+        
+        # Write under a per-thread name and swap in atomically, so a partial
+        # download is never visible at filepath
+        tmp_path = f"{filepath}.{threading.get_ident()}.tmp"
+        max_attempts = max(1, config.PDF_MAX_RETRIES)
+        
+        for attempt in range(max_attempts):
             try:
-                logger.debug(f"📥 Download attempt {attempt + 1}/{max_retries}")
-                
-                response = self.session.get(
+                # The context manager returns the connection to the pool even
+                # when the body is rejected or the copy fails part-way
+                with self.session.get(
                     url, 
                     timeout=config.PDF_DOWNLOAD_TIMEOUT, 
                     stream=True, 
                     allow_redirects=True
-                )
-                response.raise_for_status()
-                
-                # Check content type
-                content_type = response.headers.get('content-type', '').lower()
-                if 'pdf' not in content_type and 'octet-stream' not in content_type:
-                    logger.warning(f"⚠️  Unexpected content type: {content_type}")
-                
-                # Write file
-                os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                with open(filepath, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
+                ) as response:
+                    response.raise_for_status()
+                    
+                    # Check content type
+                    content_type = response.headers.get('content-type', '').lower()
+                    if 'pdf' not in content_type and 'octet-stream' not in content_type:
+                        logger.warning(f"⚠️  Unexpected content type: {content_type}")
+                    
+                    # Reject bodies too small to be a PDF without reading them
+                    declared_size = self._declared_size(response.headers)
+                    if declared_size is not None and declared_size < 1000:  # Same minimum size as is_valid_pdf
+                        logger.error(f"❌ PDF is too small ({declared_size} bytes)")
+                        return False
+                    
+                    # Validate the PDF header before writing anything
+                    response.raw.decode_content = True
+                    header = response.raw.read(8)
+                    if not header.startswith(b'%PDF'):
+                        logger.error("❌ Downloaded file is not a valid PDF")
+                        return False
+                    
+                    # Write file in large chunks straight from the socket; the folder
+                    # normally exists already, so it is only created on demand
+                    try:
+                        f = open(tmp_path, 'wb', buffering=config.PDF_DOWNLOAD_CHUNK_SIZE)
+                    except FileNotFoundError:
+                        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+                        f = open(tmp_path, 'wb', buffering=config.PDF_DOWNLOAD_CHUNK_SIZE)
+                    with f:
+                        f.write(header)
+                        shutil.copyfileobj(response.raw, f, length=config.PDF_DOWNLOAD_CHUNK_SIZE)
+                        file_size = f.tell()
                 
-                # Validate downloaded file
-                if not is_valid_pdf(filepath):
-                    logger.error(f"❌ Downloaded file is not a valid PDF")
-                    if os.path.exists(filepath):
-                        os.remove(filepath)
-                    continue
+                if file_size < 1000:  # Same minimum size as is_valid_pdf
+                    logger.error(f"❌ PDF is too small ({file_size} bytes)")
+                    os.remove(tmp_path)
+                    return False
                 
-                file_size = os.path.getsize(filepath)
+                os.replace(tmp_path, filepath)
                 logger.debug(f"✅ Download successful ({format_file_size(file_size)})")
                 return True
-                
+            
             except requests.exceptions.Timeout:
-                logger.warning(f"⏰ Download timeout (attempt {attempt + 1})")
+                logger.warning(f"⏰ Download timeout: {url}")
             except requests.exceptions.RequestException as e:
-                logger.warning(f"🌐 Network error (attempt {attempt + 1}): {e}")
+                logger.warning(f"🌐 Network error: {e}")
+            except Urllib3HTTPError as e:
+                # Reads from response.raw raise urllib3's own errors, which the
+                # session's Retry never sees: retry the whole transfer
+                self._remove_partial(tmp_path)
+                if attempt < max_attempts - 1:
+                    wait_time = 2 ** attempt
+                    logger.warning(f"🌐 Transfer failed (attempt {attempt + 1}/{max_attempts}), retrying in {wait_time}s: {e}")
+                    time.sleep(wait_time)
+                    continue
+                logger.warning(f"🌐 Transfer failed after {max_attempts} attempts: {e}")
             except Exception as e:
-                logger.error(f"❌ Download error (attempt {attempt + 1}): {e}")
-            
-            # Clean up partial file
-            if os.path.exists(filepath):
-                try:
-                    os.remove(filepath)
-                except:
-                    pass
+                logger.error(f"❌ Download error: {e}")
             
-            if attempt < max_retries - 1:
-                wait_time = 2 ** attempt
-                logger.info(f"⏳ Waiting {wait_time}s before retry...")
-                time.sleep(wait_time)
+            break
         
-        logger.error(f"❌ Failed to download after {max_retries} attempts")
+        self._remove_partial(tmp_path)
         return False
     
+    @staticmethod
+    def _remove_partial(tmp_path: str):
+        """Delete a partially written temp file, if there is one."""
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+    
+    def _preflight_pdf(self, url: str) -> bool:
+        """
+        Check a PDF link with a HEAD request before downloading it.
+        
+        Args:
+            url: PDF URL
+        
+        Returns:
+            False if the headers show the link is not a usable PDF, True otherwise
+            (including when the HEAD request itself fails)
+        """
+        try:
+            head = self.session.head(url, allow_redirects=True, timeout=10)
+        except requests.exceptions.RequestException as e:
+            logger.debug(f"HEAD check failed, downloading anyway: {e}")
+            return True
+        
+        if head.status_code != 200:
+            return True
+        
+        content_type = head.headers.get('content-type', '').lower()
+        if content_type and 'pdf' not in content_type and 'octet-stream' not in content_type:
+            logger.error(f"❌ Link is not a PDF ({content_type}): {url}")
+            return False
+        
+        declared_size = self._declared_size(head.headers)
+        if declared_size is not None and declared_size < 1000:  # Same minimum size as is_valid_pdf
+            logger.error(f"❌ PDF is too small ({declared_size} bytes): {url}")
+            return False
+        
+        return True
+    
+    @staticmethod
+    def _declared_size(headers) -> Optional[int]:
+        """Return the Content-Length of an uncompressed body, or None if unknown."""
+        content_length = headers.get('content-length', '')
+        if not content_length.isdigit() or headers.get('content-encoding'):
+            return None  # A compressed length says nothing about the file size
+        return int(content_length)
+    
     def deduplicate_papers(self, papers_metadata: List[Dict]) -> List[Dict]:
         """
-        Remove duplicate papers based on arXiv ID.
+        Remove duplicate papers based on arXiv ID and title.
         
         Args:
             papers_metadata: List of paper metadata
@@ -365,23 +740,55 @@ class ArxivScraper:
         Returns:
             Deduplicated list
         """
+        return list(self._unique_papers(papers_metadata))
+    
+    def _unique_papers(self, papers_metadata: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Yield each paper unless an earlier one had the same ID or title.
+        
+        IDs are compared without their version suffix (2301.12345v1 and v2 are
+        the same paper) and titles ignoring case, punctuation and spacing. The
+        search methods wrap their entry generators in this, so duplicates are
+        dropped before their PDFs are downloaded.
+        
+        Args:
+            papers_metadata: Paper metadata, possibly a lazy generator
+        
+        Yields:
+            Paper metadata for first occurrences only
+        """
         seen_ids = set()
-        unique_papers = []
+        seen_titles = set()
         duplicates_removed = 0
         
         for paper in papers_metadata:
-            arxiv_id = paper.get('arxiv_id')
-            if arxiv_id not in seen_ids:
+            arxiv_id = self._normalize_id(paper.get('arxiv_id'))
+            title = self._normalize_title(paper.get('title'))
+            if arxiv_id not in seen_ids and (not title or title not in seen_titles):
                 seen_ids.add(arxiv_id)
-                unique_papers.append(paper)
+                if title:
+                    seen_titles.add(title)
+                yield paper
             else:
                 duplicates_removed += 1
                 logger.debug(f"⚠️  Skipping duplicate: {paper['title'][:50]}...")
         
         if duplicates_removed > 0:
             logger.info(f"🧹 Removed {duplicates_removed} duplicate papers")
-        
-        return unique_papers
+    
+    @staticmethod
+    def _normalize_id(arxiv_id: Optional[str]) -> Optional[str]:
+        """Lowercase an arXiv ID and strip its version suffix."""
+        if not arxiv_id:
+            return arxiv_id
+        return _VERSION_SUFFIX_RE.sub('', arxiv_id.strip().lower())
+    
+    @staticmethod
+    def _normalize_title(title: Optional[str]) -> str:
+        """Reduce a title to lowercase words without punctuation."""
+        if not title:
+            return ''
+        return ' '.join(_TITLE_PUNCT_RE.sub('', title.lower()).split())
     
     def enrich_with_citations(self, papers_metadata: List[Dict]) -> List[Dict]:
         """
@@ -395,36 +802,173 @@ class ArxivScraper:
         """
         logger.info("📊 Fetching citation metrics from Semantic Scholar...")
         
+        papers = []
+        cached = 0
         for paper in papers_metadata:
+            arxiv_id = paper.get('arxiv_id')
+            if not arxiv_id or not is_valid_arxiv_id(arxiv_id):
+                continue
+            if self._load_cached_citations(paper):
+                cached += 1
+            else:
+                papers.append(paper)
+        
+        if cached:
+            logger.info(f"📦 Using cached citation counts for {cached} papers")
+        
+        # One request per batch of papers; per-paper lookups only if a batch fails
+        for start in range(0, len(papers), _S2_BATCH_SIZE):
+            batch = papers[start:start + _S2_BATCH_SIZE]
+            if not self._fetch_citations_batch(batch):
+                for paper in batch:
+                    self._fetch_citations(paper)
+        
+        if papers:
+            prune_cache('citations', config.CITATION_CACHE_SIZE)
+        
+        return papers_metadata
+    
+    @staticmethod
+    def _load_cached_citations(paper: Dict) -> bool:
+        """
+        Apply citation counts cached by an earlier lookup, if still fresh.
+        
+        Args:
+            paper: Paper metadata with a valid arXiv ID
+        
+        Returns:
+            True if the paper was enriched from the cache
+        """
+        cache_path = get_cache_path(paper['arxiv_id'], 'citations')
+        
+        try:
+            if time.time() - os.path.getmtime(cache_path) >= config.CITATION_CACHE_TTL:
+                return False
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                counts = json.load(f)
+        except (OSError, ValueError):
+            return False  # Not cached yet, or unreadable
+        
+        paper['citation_count'] = counts.get('citation_count', 0)
+        paper['influential_citation_count'] = counts.get('influential_citation_count', 0)
+        return True
+    
+    @staticmethod
+    def _cache_citations(paper: Dict):
+        """Store a paper's citation counts so later searches skip the lookup."""
+        try:
+            with open(get_cache_path(paper['arxiv_id'], 'citations'), 'w', encoding='utf-8') as f:
+                json.dump({
+                    'citation_count': paper['citation_count'],
+                    'influential_citation_count': paper['influential_citation_count']
+                }, f)
+        except OSError as e:
+            logger.debug(f"Could not cache citations for {paper['arxiv_id']}: {e}")
+    
+    def _s2_request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Send a Semantic Scholar request at the configured rate.
+        
+        Requests start as soon as the token bucket allows instead of after a
+        fixed sleep. If the API is still throttling once the session's retries
+        are spent, the next request is held back for the Retry-After delay.
+        
+        Args:
+            method: HTTP method
+            url: Request URL
+            **kwargs: Passed through to the session
+        
+        Returns:
+            HTTP response
+        """
+        self._s2_rate_limiter.acquire()
+        response = self.s2_session.request(method, url, **kwargs)
+        
+        if response.status_code == 429:
             try:
-                arxiv_id = paper.get('arxiv_id')
-                if not arxiv_id or not is_valid_arxiv_id(arxiv_id):
-                    continue
-                
-                url = f"{config.SEMANTIC_SCHOLAR_API}/paper/arXiv:{arxiv_id}"
-                params = {'fields': 'citationCount,influentialCitationCount,year'}
-                
-                response = requests.get(url, params=params, timeout=10)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    paper['citation_count'] = data.get('citationCount', 0)
-                    paper['influential_citation_count'] = data.get('influentialCitationCount', 0)
-                    logger.debug(f"   {paper['title'][:40]}: {paper['citation_count']} citations")
-                elif response.status_code == 404:
-                    logger.debug(f"   Paper not found in Semantic Scholar: {arxiv_id}")
-                    paper['citation_count'] = 0
-                    paper['influential_citation_count'] = 0
-                else:
-                    logger.debug(f"   Could not fetch citations for {arxiv_id}: {response.status_code}")
-                    paper['citation_count'] = 0
-                    paper['influential_citation_count'] = 0
-                
-                time.sleep(0.5)  # Rate limiting
-                
-            except Exception as e:
-                logger.debug(f"   Citation fetch error for {paper.get('title', 'Unknown')}: {e}")
+                retry_after = float(response.headers.get('Retry-After', 0))
+            except ValueError:
+                retry_after = 0  # HTTP-date form; the session's backoff already waited
+            if retry_after > 0:
+                logger.debug(f"   Semantic Scholar rate limit hit, waiting {retry_after:.0f}s")
+                time.sleep(retry_after)
+        
+        return response
+    
+    def _fetch_citations_batch(self, papers: List[Dict]) -> bool:
+        """
+        Fetch citation counts for several papers with one Semantic Scholar request.
+        
+        Args:
+            papers: Paper metadata with valid arXiv IDs
+        
+        Returns:
+            True if the papers were enriched, False if the batch request failed
+        """
+        try:
+            response = self._s2_request(
+                'POST',
+                f"{config.SEMANTIC_SCHOLAR_API}/paper/batch",
+                params={'fields': _S2_CITATION_FIELDS},
+                json={'ids': [f"ARXIV:{paper['arxiv_id']}" for paper in papers]},
+                timeout=30
+            )
+            
+            if response.status_code != 200:
+                logger.debug(f"   Batch citation lookup failed: {response.status_code}")
+                return False
+            
+            results = response.json()
+        
+        except Exception as e:
+            logger.debug(f"   Batch citation lookup error: {e}")
+            return False
+        
+        # Results come back in request order, with null for papers Semantic Scholar doesn't know
+        for paper, data in zip(papers, results):
+            if data:
+                paper['citation_count'] = data.get('citationCount', 0)
+                paper['influential_citation_count'] = data.get('influentialCitationCount', 0)
+                logger.debug(f"   {paper['title'][:40]}: {paper['citation_count']} citations")
+            else:
+                logger.debug(f"   Paper not found in Semantic Scholar: {paper['arxiv_id']}")
                 paper['citation_count'] = 0
                 paper['influential_citation_count'] = 0
+            self._cache_citations(paper)
         
-        return papers_metadata
\ No newline at end of file
+        return True
+    
+    def _fetch_citations(self, paper: Dict):
+        """
+        Fetch citation counts for a single paper.
+        
+        Args:
+            paper: Paper metadata with a valid arXiv ID
+        """
+        try:
+            arxiv_id = paper['arxiv_id']
+            url = f"{config.SEMANTIC_SCHOLAR_API}/paper/arXiv:{arxiv_id}"
+            params = {'fields': _S2_CITATION_FIELDS}
+            
+            response = self._s2_request('GET', url, params=params, timeout=10)
+            
+            if response.status_code == 200:
+                data = response.json()
+                paper['citation_count'] = data.get('citationCount', 0)
+                paper['influential_citation_count'] = data.get('influentialCitationCount', 0)
+                logger.debug(f"   {paper['title'][:40]}: {paper['citation_count']} citations")
+                self._cache_citations(paper)
+            elif response.status_code == 404:
+                logger.debug(f"   Paper not found in Semantic Scholar: {arxiv_id}")
+                paper['citation_count'] = 0
+                paper['influential_citation_count'] = 0
+                self._cache_citations(paper)
+            else:
+                logger.debug(f"   Could not fetch citations for {arxiv_id}: {response.status_code}")
+                paper['citation_count'] = 0
+                paper['influential_citation_count'] = 0
+            
+        except Exception as e:
+            logger.debug(f"   Citation fetch error for {paper.get('title', 'Unknown')}: {e}")
+            paper['citation_count'] = 0
+            paper['influential_citation_count'] = 0
\ No newline at end of file
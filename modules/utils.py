@@ -4,6 +4,8 @@ import re
 import hashlib
 import logging
 import sys
+import time
+import threading
 from datetime import datetime
 from logging.handlers import RotatingFileHandler
 from typing import List, Dict, Optional
@@ -224,16 +226,14 @@ def is_valid_pdf(filepath: str) -> bool:
     Returns:
         True if valid PDF
     """
-    if not os.path.exists(filepath):
-        return False
-    
-    # Check file size
-    if os.path.getsize(filepath) < 1000:  # Less than 1KB
-        return False
-    
-    # Check PDF header
+    # One open serves the existence, size and header checks
     try:
         with open(filepath, 'rb') as f:
+            # Check file size
+            if os.fstat(f.fileno()).st_size < 1000:  # Less than 1KB
+                return False
+            
+            # Check PDF header
             header = f.read(8)
             return header.startswith(b'%PDF')
     except Exception:
@@ -357,6 +357,37 @@ class ProgressTracker:
         elapsed = (datetime.now() - self.start_time).total_seconds()
         logger.info(f"{self.description}: Completed {self.total} items in {format_duration(elapsed)}")
 
+class RateLimiter:
+    """
+    Thread-safe token bucket for outgoing requests.
+    
+    Up to `burst` requests start immediately; after that, request starts are
+    spaced `interval` seconds apart on average. Each caller reserves its slot
+    under the lock and sleeps outside it, so concurrent callers queue fairly.
+    """
+    
+    def __init__(self, interval: float, burst: int = 1):
+        self.interval = interval  # Seconds per token; <= 0 disables limiting
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a request may start."""
+        if self.interval <= 0:
+            return
+        
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) / self.interval)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens * self.interval
+        
+        if wait > 0:
+            time.sleep(wait)
+
 # ========== CACHE MANAGEMENT ==========
 
 def get_cache_path(identifier: str, cache_type: str = 'compilation') -> str:
@@ -379,4 +410,39 @@ def get_cache_path(identifier: str, cache_type: str = 'compilation') -> str:
 def cache_exists(identifier: str, cache_type: str = 'compilation') -> bool:
     """Check if cache exists for identifier."""
     cache_path = get_cache_path(identifier, cache_type)
-    return os.path.exists(cache_path)
\ No newline at end of file
+    return os.path.exists(cache_path)
+
+def prune_cache(cache_type: str, max_entries: int) -> int:
+    """
+    Evict least-recently-used cache files beyond max_entries.
+    
+    Cache readers should touch a file (os.utime) on hit so that
+    modification time tracks recency of use.
+    
+    Args:
+        cache_type: Type of cache (subdirectory under CACHE_DIR)
+        max_entries: Maximum number of cache files to keep
+    
+    Returns:
+        Number of cache files removed
+    """
+    cache_subdir = os.path.join(config.CACHE_DIR, cache_type)
+    
+    try:
+        entries = [entry for entry in os.scandir(cache_subdir) if entry.is_file()]
+    except FileNotFoundError:
+        return 0
+    
+    if len(entries) <= max_entries:
+        return 0
+    
+    entries.sort(key=lambda entry: entry.stat().st_mtime)
+    removed = 0
+    for entry in entries[:len(entries) - max_entries]:
+        try:
+            os.remove(entry.path)
+            removed += 1
+        except OSError as e:
+            logger.debug(f"Could not evict cache file {entry.path}: {e}")
+    
+    return removed
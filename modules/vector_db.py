@@ -1,7 +1,10 @@
 # modules/vector_db.py - Vector Database Management
 import os
 import json
+import hashlib
+import threading
 from typing import List, Dict, Optional, Tuple
+import numpy as np
 import chromadb
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
@@ -9,6 +12,71 @@ from config import config
 from modules.utils import logger
 from modules.database import db
 
+# usearch is optional: when installed, unfiltered searches rank candidates on an
+# int8-quantized copy of the embeddings and re-rank them at full precision
+try:
+    from usearch.index import Index as USearchIndex
+except ImportError:
+    USearchIndex = None
+
+# ChromaDB distance space -> usearch metric
+_USEARCH_METRICS = {'l2': 'l2sq', 'cosine': 'cos', 'ip': 'ip'}
+
+# numba is optional: when installed, re-rank distances come from a JIT-compiled
+# loop that LLVM vectorizes for the host CPU (AVX2/AVX-512 FMA, NEON)
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+_SPACE_L2, _SPACE_COSINE, _SPACE_IP = 0, 1, 2
+_SPACE_CODES = {'l2': _SPACE_L2, 'cosine': _SPACE_COSINE, 'ip': _SPACE_IP}
+
+if njit is not None:
+    @njit(cache=True, fastmath=True, boundscheck=False)
+    def _candidate_distances(vectors, rows, query, space):
+        """Distance from query to each selected row of vectors, one fused pass per row."""
+        query_norm = np.float32(0.0)
+        for j in range(query.shape[0]):
+            query_norm += query[j] * query[j]
+        
+        distances = np.empty(rows.shape[0], dtype=np.float32)
+        for i in range(rows.shape[0]):
+            vector = vectors[rows[i]]
+            dot = np.float32(0.0)
+            norm = np.float32(0.0)
+            squared = np.float32(0.0)
+            for j in range(vector.shape[0]):
+                x = vector[j]
+                q = query[j]
+                dot += x * q
+                norm += x * x
+                squared += (x - q) * (x - q)
+            
+            if space == _SPACE_L2:
+                distances[i] = squared
+            elif space == _SPACE_COSINE:
+                distances[i] = 1.0 - dot / max(np.sqrt(norm * query_norm), 1e-12)
+            else:
+                distances[i] = 1.0 - dot
+        return distances
+else:
+    _candidate_distances = None
+
+class _EmbedderFunction:
+    """
+    ChromaDB embedding function backed by the shared SentenceTransformer.
+    
+    Chunks stored by collection.add() and queries embedded for the quantized
+    search must come from the same model, or their distances mean nothing.
+    """
+    
+    def __init__(self, embedder):
+        self.embedder = embedder
+    
+    def __call__(self, input):
+        return self.embedder.encode(list(input), convert_to_numpy=True, normalize_embeddings=True).tolist()
+
 class VectorDatabase:
     """
     Manages vector embeddings and semantic search for research papers.
@@ -29,36 +97,89 @@ class VectorDatabase:
             )
         )
         
+        # Initialize embedding model
+        logger.info(f"Loading embedding model: {config.EMBEDDING_MODEL}")
+        self.embedder = SentenceTransformer(
+            config.EMBEDDING_MODEL,
+            device=config.EMBEDDING_DEVICE
+        )
+        self.embedding_function = _EmbedderFunction(self.embedder)
+        
         # Get or create collection
         try:
             self.collection = self.client.get_collection(
-                name=config.CHROMA_COLLECTION_NAME
+                name=config.CHROMA_COLLECTION_NAME,
+                embedding_function=self.embedding_function
             )
             logger.info(f"Loaded existing collection: {self.collection.count()} documents")
         except:
             self.collection = self.client.create_collection(
                 name=config.CHROMA_COLLECTION_NAME,
-                metadata={"description": "Research paper embeddings"}
+                metadata={"description": "Research paper embeddings"},
+                embedding_function=self.embedding_function
             )
             logger.info("Created new collection")
         
-        # Initialize embedding model
-        logger.info(f"Loading embedding model: {config.EMBEDDING_MODEL}")
-        self.embedder = SentenceTransformer(
-            config.EMBEDDING_MODEL,
-            device=config.EMBEDDING_DEVICE
-        )
+        # "<chunk count>:<digest of chunk IDs>" - changes only when the indexed chunks
+        # do (chunk IDs embed a content hash) and is the same across restarts, so
+        # callers can key persisted results on it
+        self._stamp_lock = threading.Lock()
+        self._chunk_count = 0
+        self._chunk_digest = 0
+        self.index_stamp = '0:0000000000000000'
+        self._recompute_stamp()
+        
+        # int8 usearch copy of the collection, synced lazily when index_stamp changes
+        self._quantized: Optional[Dict] = None
+        self._quantized_lock = threading.Lock()
         
         logger.info(f"VectorDatabase initialized with {self.collection.count()} documents")
 
     def refresh(self):
         """Refresh collection handle so newly indexed documents are queryable without restart."""
         try:
-            self.collection = self.client.get_collection(name=config.CHROMA_COLLECTION_NAME)
-            logger.info(f"Vector DB refreshed: {self.collection.count()} documents")
+            self.collection = self.client.get_collection(
+                name=config.CHROMA_COLLECTION_NAME,
+                embedding_function=self.embedding_function
+            )
+            previous = self.index_stamp
+            self._recompute_stamp()
+            changed = "changed" if self.index_stamp != previous else "unchanged"
+            logger.info(f"Vector DB refreshed: {self.collection.count()} documents ({changed})")
         except Exception as e:
             logger.warning(f"Vector DB refresh failed: {e}")
     
+    @staticmethod
+    def _id_digest(chunk_ids: List[str]) -> int:
+        """Order-independent 64-bit digest of chunk IDs, so it can be updated per paper."""
+        return sum(
+            int.from_bytes(hashlib.blake2b(chunk_id.encode(), digest_size=8).digest(), 'big')
+            for chunk_id in chunk_ids
+        )
+    
+    def _set_stamp(self, count: int, digest: int):
+        """Store the chunk count and digest; callers hold _stamp_lock."""
+        self._chunk_count, self._chunk_digest = count, digest % (1 << 64)
+        self.index_stamp = f"{self._chunk_count}:{self._chunk_digest:016x}"
+    
+    def _recompute_stamp(self):
+        """Recompute index_stamp from the IDs stored in the collection."""
+        try:
+            chunk_ids = self.collection.get(include=[])['ids']
+        except Exception as e:
+            logger.warning(f"Could not read chunk IDs for index stamp: {e}")
+            return
+        with self._stamp_lock:
+            self._set_stamp(len(chunk_ids), self._id_digest(chunk_ids))
+    
+    def _update_stamp(self, added: List[str] = (), removed: List[str] = ()):
+        """Fold chunks this process added or removed into index_stamp."""
+        with self._stamp_lock:
+            self._set_stamp(
+                self._chunk_count + len(added) - len(removed),
+                self._chunk_digest + self._id_digest(added) - self._id_digest(removed)
+            )
+    
     def chunk_text(self, text: str, chunk_size: int = None, overlap: int = None) -> List[str]:
         """
         Split text into overlapping chunks.
@@ -132,6 +253,7 @@ class VectorDatabase:
                     'arxiv_id': metadata.get('arxiv_id', 'unknown'),
                     'title': metadata.get('title', 'unknown'),
                     'section_type': 'abstract',
+                    'section_type_lc': 'abstract',
                     'chunk_index': 0,
                     'priority': 'high'
                 })
@@ -153,6 +275,7 @@ class VectorDatabase:
                         'arxiv_id': metadata.get('arxiv_id', 'unknown'),
                         'title': metadata.get('title', 'unknown'),
                         'section_type': 'contributions',
+                        'section_type_lc': 'contributions',
                         'chunk_index': 0,
                         'priority': 'high'
                     })
@@ -177,7 +300,6 @@ class VectorDatabase:
                         continue
                     
                     # Create truly unique ID with hash for safety
-                    import hashlib
                     chunk_hash = hashlib.md5(chunk.encode()).hexdigest()[:8]
                     unique_id = f"paper_{paper_id}_{safe_section}_{chunk_idx}_{chunk_hash}"
                         
@@ -188,6 +310,7 @@ class VectorDatabase:
                         'arxiv_id': metadata.get('arxiv_id', 'unknown'),
                         'title': metadata.get('title', 'unknown'),
                         'section_type': section_name,
+                        'section_type_lc': section_name.lower(),  # Saves a lower() per chunk per query
                         'chunk_index': chunk_idx,
                         'priority': 'normal'
                     })
@@ -200,6 +323,7 @@ class VectorDatabase:
                     metadatas=metadatas,
                     ids=ids
                 )
+                self._update_stamp(added=ids)
                 
                 logger.info(f"Indexed {len(documents)} chunks for paper {paper_id}")
                 return len(documents)
@@ -225,16 +349,40 @@ class VectorDatabase:
         Returns:
             List of search results with metadata
         """
+        return self.search_batch([query], top_k, filter_job_id, filter_paper_id)[0] or []
+    
+    def search_batch(self, queries: List[str], top_k: int = None,
+                     filter_job_id: Optional[int] = None,
+                     filter_paper_id: Optional[int] = None) -> List[Optional[List[Dict]]]:
+        """
+        Semantic search for several queries with a single collection query.
+        
+        All queries are embedded and searched together; each query falls back
+        to an unfiltered search if the filter returns nothing for it.
+        
+        Args:
+            queries: Search queries
+            top_k: Number of results to return per query
+            filter_job_id: Optional job ID to restrict search (for isolation)
+            filter_paper_id: Optional paper ID to restrict search
+        
+        Returns:
+            One list of search results per query, in query order. Every entry
+            is None if the search failed, so callers can tell a failure from
+            a query with no hits and fall back.
+        """
         top_k = top_k or config.RAG_TOP_K_RESULTS
+        if not queries:
+            return []
         
         try:
             # Check if collection has data
             total_docs = self.collection.count()
             if total_docs == 0:
                 logger.warning("Collection is empty!")
-                return []
+                return [[] for _ in queries]
             
-            logger.debug(f"Searching {total_docs} documents with query: '{query[:50]}' (job_id={filter_job_id})")
+            logger.debug(f"Searching {total_docs} documents with {len(queries)} queries, first: '{queries[0][:50]}' (job_id={filter_job_id})")
             
             # First, try to search with filter if job_id is specified
             # If no results, fall back to unfiltered search (handles old documents)
@@ -252,57 +400,204 @@ class VectorDatabase:
                 where = where if where else None
             
             # Perform search - get more results than needed
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=n_results,
-                where=where
-            )
+            rows = self._quantized_rows(queries, n_results) if where is None else None
+            if rows is None:
+                results = self.collection.query(
+                    query_texts=list(queries),
+                    n_results=n_results,
+                    where=where
+                )
+                rows = [self._result_row(results, i) for i in range(len(queries))]
             
-            # If no results with filter, try without filter to get old documents
-            if (not results or not results.get('ids') or not results['ids'][0]) and where is not None:
-                logger.debug(f"No results with filter, trying without filter...")
+            # Queries with no results under the filter are retried together without it
+            missing = [i for i, row in enumerate(rows) if not row['ids']]
+            if missing and where is not None:
+                logger.debug(f"No results with filter for {len(missing)} queries, trying without filter...")
                 results = self.collection.query(
-                    query_texts=[query],
+                    query_texts=[queries[i] for i in missing],
                     n_results=n_results,
                     where=None
                 )
+                for j, i in enumerate(missing):
+                    rows[i] = self._result_row(results, j)
             
-            if not results or not results.get('ids') or not results['ids'][0]:
-                logger.warning(f"Search returned no results")
-                return []
+            return [self._format_results(query, row, top_k) for query, row in zip(queries, rows)]
             
-            # Format results
-            formatted_results = []
+        except Exception as e:
+            logger.error(f"Search error: {e}", exc_info=True)
+            return [None for _ in queries]
+    
+    def _result_row(self, results: Dict, i: int) -> Dict:
+        """Pick query i's columns out of a multi-query collection result."""
+        def column(key):
+            values = (results or {}).get(key) or []
+            return values[i] if i < len(values) and values[i] else []
+        
+        return {key: column(key) for key in ('ids', 'documents', 'metadatas', 'distances')}
+    
+    def _get_quantized_index(self) -> Optional[Dict]:
+        """
+        Return the int8 usearch index over the collection's embeddings.
+        
+        Synced with ChromaDB whenever the indexed chunks change: only added
+        chunks' embeddings are read, and one thread syncs while the others
+        wait for it. None when usearch is not installed or quantized search
+        is disabled.
+        """
+        if USearchIndex is None or not config.VECTOR_QUANTIZED_SEARCH:
+            return None
+        
+        quantized = self._quantized
+        if quantized is not None and quantized['version'] == self.index_stamp:
+            return quantized
+        
+        with self._quantized_lock:
+            version = self.index_stamp
+            quantized = self._quantized
+            if quantized is not None and quantized['version'] == version:
+                return quantized  # Synced by another thread while we waited
             
-            for i in range(len(results['ids'][0])):
-                distance = results['distances'][0][i] if 'distances' in results else 0
-                relevance_score = 1 - distance  # Convert distance to similarity
-                
-                # Only include results above threshold
-                if relevance_score >= config.RAG_SIMILARITY_THRESHOLD:
-                    result = {
-                        'id': results['ids'][0][i],
-                        'text': results['documents'][0][i],
-                        'metadata': results['metadatas'][0][i],
-                        'distance': distance,
-                        'relevance_score': relevance_score
-                    }
-                    formatted_results.append(result)
+            space = (self.collection.metadata or {}).get('hnsw:space', 'l2')
+            if quantized is None or quantized['space'] != space:
+                quantized = {'index': None, 'keys': {}, 'ids': {}, 'next_key': 0, 'space': space}
+            self._sync_quantized(quantized)
             
-            # Sort by relevance and limit
-            formatted_results.sort(key=lambda x: x['relevance_score'], reverse=True)
-            formatted_results = formatted_results[:top_k]
+            quantized['version'] = version
+            self._quantized = quantized
+            return quantized
+    
+    def _sync_quantized(self, quantized: Dict):
+        """Add new chunks to and remove deleted chunks from the quantized index in place."""
+        keys, ids = quantized['keys'], quantized['ids']  # chunk ID -> usearch key, and back
+        current = self.collection.get(include=[])['ids']
+        current_set = set(current)
+        
+        removed = [chunk_id for chunk_id in keys if chunk_id not in current_set]
+        if removed:
+            quantized['index'].remove(np.array([keys[chunk_id] for chunk_id in removed], dtype=np.uint64))
+            for chunk_id in removed:
+                del ids[keys.pop(chunk_id)]
+        
+        added = [chunk_id for chunk_id in current if chunk_id not in keys]
+        if added:
+            data = self.collection.get(ids=added, include=['embeddings'])
+            vectors = np.asarray(data['embeddings'], dtype=np.float32)
+            if quantized['index'] is None:
+                quantized['index'] = USearchIndex(
+                    ndim=vectors.shape[1], metric=_USEARCH_METRICS[quantized['space']], dtype='i8'
+                )
             
-            logger.info(f"Search for '{query[:50]}...' returned {len(formatted_results)} results")
+            new_keys = np.arange(quantized['next_key'], quantized['next_key'] + len(vectors), dtype=np.uint64)
+            quantized['next_key'] += len(vectors)
+            # Map keys before adding them, so concurrent searches can resolve every hit
+            for key, chunk_id in zip(new_keys.tolist(), data['ids']):
+                keys[chunk_id] = key
+                ids[key] = chunk_id
+            quantized['index'].add(new_keys, vectors)
+        
+        logger.info(f"Synced int8 search index: {len(ids)} chunks (+{len(added)}, -{len(removed)})")
+    
+    def _quantized_rows(self, queries: List[str], n_results: int) -> Optional[List[Dict]]:
+        """
+        Search the quantized index, then re-rank candidates with full-precision vectors.
+        
+        Returns raw result rows like _result_row, or None to use ChromaDB search.
+        """
+        try:
+            quantized = self._get_quantized_index()
+            if quantized is None or not quantized['ids']:
+                return None
             
-            if formatted_results:
-                logger.debug(f"Top result: {formatted_results[0]['metadata'].get('title', 'Unknown')[:50]} (score: {formatted_results[0]['relevance_score']:.3f})")
+            # Same embedding function the collection stores chunks with
+            query_vectors = np.asarray(self.embedding_function(queries), dtype=np.float32)
+            count = min(n_results * config.VECTOR_RERANK_FACTOR, len(quantized['ids']))
+            candidates = []
+            for query_vector in query_vectors:
+                keys = quantized['index'].search(query_vector, count).keys.tolist()
+                # Keys removed by a concurrent sync no longer resolve
+                candidates.append([chunk_id for chunk_id in map(quantized['ids'].get, keys) if chunk_id is not None])
+            return self._rerank_fp32(query_vectors, candidates, n_results, quantized['space'])
+        
+        except Exception as e:
+            logger.warning(f"Quantized search failed, using ChromaDB search: {e}")
+            return None
+    
+    def _rerank_fp32(self, query_vectors: np.ndarray, candidates: List[List[str]],
+                     n_results: int, space: str) -> List[Dict]:
+        """
+        Rank each query's candidates by exact distance to their stored embeddings.
+        
+        Only the candidates' full-precision vectors are loaded, in one collection read.
+        """
+        unique_ids = list(dict.fromkeys(chunk_id for ids in candidates for chunk_id in ids))
+        data = self.collection.get(ids=unique_ids, include=['embeddings', 'documents', 'metadatas'])
+        position = {chunk_id: i for i, chunk_id in enumerate(data['ids'])}
+        vectors = np.asarray(data['embeddings'], dtype=np.float32)
+        
+        rows = []
+        for query_vector, ids in zip(query_vectors, candidates):
+            ids = [chunk_id for chunk_id in ids if chunk_id in position]
+            if not ids:
+                rows.append({'ids': [], 'documents': [], 'metadatas': [], 'distances': []})
+                continue
             
-            return formatted_results
+            candidate_rows = np.array([position[chunk_id] for chunk_id in ids], dtype=np.int64)
+            if _candidate_distances is not None:
+                distances = _candidate_distances(vectors, candidate_rows, query_vector, _SPACE_CODES[space])
+            else:
+                candidate_vectors = vectors[candidate_rows]
+                if space == 'l2':
+                    distances = np.square(candidate_vectors - query_vector).sum(axis=1)
+                elif space == 'cosine':
+                    norms = np.linalg.norm(candidate_vectors, axis=1) * np.linalg.norm(query_vector)
+                    distances = 1.0 - candidate_vectors @ query_vector / np.maximum(norms, 1e-12)
+                else:
+                    distances = 1.0 - candidate_vectors @ query_vector
             
-        except Exception as e:
-            logger.error(f"Search error: {e}", exc_info=True)
+            order = np.argsort(distances, kind='stable')[:n_results].tolist()
+            rows.append({
+                'ids': [ids[i] for i in order],
+                'documents': [data['documents'][position[ids[i]]] for i in order],
+                'metadatas': [data['metadatas'][position[ids[i]]] for i in order],
+                'distances': distances[order].tolist()
+            })
+        
+        return rows
+    
+    def _format_results(self, query: str, row: Dict, top_k: int) -> List[Dict]:
+        """Turn one query's raw results into scored, thresholded, sorted results."""
+        if not row['ids']:
+            logger.warning(f"Search returned no results")
             return []
+        
+        # Format results
+        formatted_results = []
+        
+        for i in range(len(row['ids'])):
+            distance = row['distances'][i] if row['distances'] else 0
+            relevance_score = 1 - distance  # Convert distance to similarity
+            
+            # Only include results above threshold
+            if relevance_score >= config.RAG_SIMILARITY_THRESHOLD:
+                result = {
+                    'id': row['ids'][i],
+                    'text': row['documents'][i],
+                    'metadata': row['metadatas'][i],
+                    'distance': distance,
+                    'relevance_score': relevance_score
+                }
+                formatted_results.append(result)
+        
+        # Sort by relevance and limit
+        formatted_results.sort(key=lambda x: x['relevance_score'], reverse=True)
+        formatted_results = formatted_results[:top_k]
+        
+        logger.info(f"Search for '{query[:50]}...' returned {len(formatted_results)} results")
+        
+        if formatted_results:
+            logger.debug(f"Top result: {formatted_results[0]['metadata'].get('title', 'Unknown')[:50]} (score: {formatted_results[0]['relevance_score']:.3f})")
+        
+        return formatted_results
     
     def get_paper_context(self, paper_id: int) -> str:
         """
@@ -345,6 +640,7 @@ class VectorDatabase:
             
             if results['ids']:
                 self.collection.delete(ids=results['ids'])
+                self._update_stamp(removed=results['ids'])
                 logger.info(f"Deleted {len(results['ids'])} chunks for paper {paper_id}")
                 return True
             
@@ -391,8 +687,10 @@ class VectorDatabase:
         try:
             self.client.delete_collection(config.CHROMA_COLLECTION_NAME)
             self.collection = self.client.create_collection(
-                name=config.CHROMA_COLLECTION_NAME
+                name=config.CHROMA_COLLECTION_NAME,
+                embedding_function=self.embedding_function
             )
+            self._recompute_stamp()
             logger.warning("Collection cleared!")
         except Exception as e:
             logger.error(f"Error clearing collection: {e}")